@@ -0,0 +1,187 @@
+# narabench.py
+# 로컬 모의 API(naramock.py)로 조회/파싱/정리/필터/표 표시/내보내기 성능을 재는 벤치마크 (실제 API 호출 없음)
+#
+# 예) python narabench.py                                  (1천/1만/10만 건, 동시 요청 1·4·8)
+#     python narabench.py --sizes 10000 --concurrency 4 --latency 0.2 --error-rate 0.05 --json bench.jsonl
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from urllib.request import urlopen
+
+from naracore import (
+    CATEGORY_COLS,
+    ContractApiClient,
+    ContractDayCache,
+    ContractQuery,
+    Metrics,
+    build_display_frame,
+    build_export,
+    fetch_contracts,
+    filter_rows,
+    ingest_contracts,
+)
+
+BENCH_START = date(2024, 1, 1)  # 캐시 TTL(최근 구간)에 걸리지 않는 지난 1년
+BENCH_END = date(2024, 12, 31)
+BENCH_QUERY = ContractQuery('통합관제')
+BENCH_FILTERS = {'cntrctNm': '용역 1', 'cntrctInsttNm': '기관1'}  # AND 조건 필터
+BENCH_EXPORT_FORMATS = ('CSV', 'XLSX')
+
+
+def _int_list(text):
+    return [int(v) for v in text.split(',') if v.strip()]
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def _grid_payload(frame):
+    """AgGrid로 넘길 때 서버에서 하는 일과 같게 행 ID 컬럼을 붙여 Arrow로 직렬화한 바이트 (pyarrow가 없으면 JSON)"""
+    frame = frame.copy()
+    frame['::auto_unique_id::'] = list(map(str, range(len(frame))))
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return frame.to_json(orient='records').encode('utf-8')
+    table = pa.Table.from_pandas(frame)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_process(mock_args, startup_timeout=10.0):
+    """naramock.py를 별도 프로세스로 띄우고 (process, api_url)을 반환.
+
+    같은 프로세스에서 돌리면 모의 서버의 XML 생성이 조회 측 파싱과 GIL을 다투어 측정값이
+    왜곡되므로 따로 실행한다.
+    """
+    port = _free_port()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'naramock.py')
+    process = subprocess.Popen([sys.executable, script, '--port', str(port), *mock_args], stdout=subprocess.DEVNULL)
+    api_url = f"http://127.0.0.1:{port}/"
+    deadline = time.monotonic() + startup_timeout
+    while True:
+        try:
+            with urlopen(api_url + 'stats', timeout=1):
+                return process, api_url
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("모의 API 서버를 시작하지 못했습니다.")
+            time.sleep(0.1)
+
+
+def bench_fetch(api_url, concurrency, client_timeout):
+    """빈 캐시에서 BENCH_START~BENCH_END를 조회. (DataFrame, 소요 시간, 'page' 이벤트 요약)"""
+    metrics = Metrics(log_path=None)
+    client = ContractApiClient(api_url=api_url, service_key='bench', pool_size=concurrency, timeout=client_timeout)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ContractDayCache(os.path.join(tmp, 'bench.sqlite3'))
+        df, seconds = _timed(
+            lambda: fetch_contracts(BENCH_START, BENCH_END, (BENCH_QUERY,), client=client, cache=cache,
+                                    max_workers=concurrency, metrics=metrics)
+        )
+    return df, seconds, metrics.summary().get('page', {})
+
+
+def bench_frame(df):
+    """조회 결과 하나로 정리/필터/표 표시/내보내기 단계별 (단계, 소요 시간, 추가 정보) 목록"""
+    results = []
+
+    df, seconds = _timed(ingest_contracts, df)
+    results.append(('normalize', seconds, {'category_cols': sum(c in df.columns for c in CATEGORY_COLS)}))
+
+    indexes = {}
+    positions, seconds = _timed(filter_rows, df, BENCH_FILTERS, indexes)
+    results.append(('filter_cold', seconds, {'matched': len(positions)}))  # 색인 생성 포함
+    positions, seconds = _timed(filter_rows, df, BENCH_FILTERS, indexes)
+    results.append(('filter_warm', seconds, {'matched': len(positions)}))
+
+    # 화면과 같은 경로: 조회 결과마다 한 번 만드는 표시용 프레임, 필터 결과 행(iloc) + 그리드로 넘길 데이터
+    # (페이지 이동은 브라우저의 AgGrid가 처리하므로 서버 쪽 비용은 필터가 바뀔 때마다 이 두 단계)
+    display_df, seconds = _timed(build_display_frame, df)
+    results.append(('display_frame', seconds, {'columns': len(display_df.columns)}))
+    for stage, rows in (('grid_filtered', positions), ('grid_all', None)):
+        started = time.perf_counter()
+        view = display_df if rows is None else display_df.iloc[rows]
+        payload = _grid_payload(view)
+        results.append((stage, time.perf_counter() - started, {'view_rows': len(view), 'bytes': len(payload)}))
+
+    for fmt in BENCH_EXPORT_FORMATS:
+        data, seconds = _timed(build_export, df, fmt)
+        results.append((f"export_{fmt.lower()}", seconds, {'bytes': len(data)}))
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="나라장터 계약 조회 오프라인 벤치마크 (로컬 모의 API 사용)")
+    parser.add_argument("--sizes", type=_int_list, default=[1000, 10000, 100000], help="1년 조회 건수 목록 (쉼표 구분)")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 8], help="비교할 동시 요청 수 목록 (쉼표 구분)")
+    parser.add_argument("--max-rows", type=int, help="모의 API 한 페이지 최대 행 수 (기본: 실제 API와 같음)")
+    parser.add_argument("--latency", type=float, default=0.05, help="모의 API 응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="모의 API 응답 지연에 더할 무작위 지연 상한(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429/500/503 응답 비율 (0~1)")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="응답하지 않는 요청 비율 (0~1)")
+    parser.add_argument("--client-timeout", type=float, default=2.0, help="벤치마크 클라이언트 요청 타임아웃(초)")
+    parser.add_argument("--seed", type=int, default=0, help="모의 API 오류/지연 난수 시드")
+    parser.add_argument("--json", help="결과를 JSON lines로 덧붙일 파일")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = Metrics(log_path=args.json)
+
+    def record(size, stage, seconds, rows, **fields):
+        report.emit('bench', size=size, stage=stage, seconds=round(seconds, 4), rows=rows,
+                    rows_per_s=round(rows / max(seconds, 1e-6)), **fields)
+        extra = " ".join(f"{k}={v}" for k, v in fields.items())
+        print(f"{size:>8} {stage:<14} {seconds:>9.3f}s {rows / max(seconds, 1e-6):>12,.0f} rows/s  {extra}", flush=True)
+
+    print(f"{'size':>8} {'stage':<14} {'seconds':>10} {'throughput':>17}")
+    for size in args.sizes:
+        mock_args = [
+            '--rows-per-year', str(size), '--latency', str(args.latency), '--jitter', str(args.jitter),
+            '--error-rate', str(args.error_rate), '--timeout-rate', str(args.timeout_rate),
+            '--hang', str(args.client_timeout + 1), '--seed', str(args.seed),
+        ]
+        if args.max_rows:
+            mock_args += ['--max-rows', str(args.max_rows)]
+        process, api_url = start_mock_process(mock_args)
+        try:
+            df = None
+            for concurrency in args.concurrency:
+                df, seconds, pages = bench_fetch(api_url, concurrency, args.client_timeout)
+                record(size, f"fetch_c{concurrency}", seconds, len(df), concurrency=concurrency,
+                       pages=pages.get('count', 0), retries=pages.get('retries', 0), bytes=pages.get('bytes', 0))
+                record(size, f"parse_c{concurrency}", pages.get('parse_seconds', 0.0), len(df),
+                       http_seconds=pages.get('http_seconds', 0.0))
+            with urlopen(api_url + 'stats', timeout=5) as response:
+                stats = json.load(response)
+            for stage, seconds, fields in bench_frame(df):
+                record(size, stage, seconds, len(df), **fields)
+            print(f"{size:>8} mock_stats     {stats}", flush=True)
+        finally:
+            process.terminate()
+            process.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# naracli.py
+# 화면 없이 나라장터 용역 계약 내역을 조회해 CSV/Parquet 파일로 저장하는 명령줄 도구 (cron 등 야간 일괄 수집용)
+#
+# 예) python naracli.py --start 2025-01-01 --end 2025-12-31 -k 통합관제센터 -k CCTV -i 지방자치단체 -o 계약내역.csv
+#     python naracli.py --sync --start 2022-01-01 -k 통합관제센터 -o 미러.parquet   (증분 동기화, 이후 실행은 --start 불필요)
+#     python naracli.py --start 2020-01-01 --end 2024-12-31 -k 통합관제센터 --store     (조회 결과를 로컬 보관소에 추가)
+#     python naracli.py --from-store --start 2022-01-01 -k 관제 --min-amount 100000000 -o 분석.parquet
+#     python naracli.py --start 2025-01-01 -k 통합관제센터 -o 계약내역.csv --summary 요약.xlsx   (기관/월/분류/업체별 요약 함께 저장)
+import argparse
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timedelta
+
+import requests
+
+from naracore import (
+    CACHE_DB_PATH,
+    DATASET_DIR,
+    FETCH_CONCURRENCY,
+    INSTITUTION_TYPES,
+    METRICS_LOG_PATH,
+    MIRROR_DB_PATH,
+    SERVICE_KEY,
+    STORE_COLUMNS,
+    ContractApiClient,
+    ContractDataset,
+    ContractDayCache,
+    ContractMirror,
+    ContractQuery,
+    Metrics,
+    NaraApiError,
+    describe_fetch_error,
+    fetch_contracts,
+    ingest_contracts,
+    summarize_contracts,
+    sync_contracts,
+    write_export,
+    write_summary_xlsx,
+)
+
+# 출력 형식: 확장자 -> write_export 형식명
+OUTPUT_FORMATS = {'csv': 'CSV', 'parquet': 'Parquet'}
+
+
+def _parse_date(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def _institution_code(text):
+    """소관기관 이름('지방자치단체') 또는 코드('02')를 코드로 변환"""
+    if text in INSTITUTION_TYPES:
+        return INSTITUTION_TYPES[text]
+    if text in INSTITUTION_TYPES.values():
+        return text
+    names = ", ".join(f"{nm}({cd})" for nm, cd in INSTITUTION_TYPES.items())
+    raise argparse.ArgumentTypeError(f"알 수 없는 소관기관: {text} (가능한 값: {names})")
+
+
+def _read_keywords(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="나라장터 용역 계약 내역 일괄 조회")
+    parser.add_argument("--start", type=_parse_date,
+                        help="조회 시작일 YYYY-MM-DD (기본: 종료일 1년 전 / --sync는 처음 동기화할 때만 필요)")
+    parser.add_argument("--end", type=_parse_date, help="조회 종료일 YYYY-MM-DD (기본: 어제 / --sync는 오늘)")
+    parser.add_argument("-k", "--keyword", action="append", default=[], help="용역명 (여러 번 지정 가능)")
+    parser.add_argument("--keywords-file", help="용역명 목록 파일 (한 줄에 하나)")
+    parser.add_argument("-i", "--institution", action="append", default=[], type=_institution_code,
+                        help="소관기관 이름 또는 코드 (여러 번 지정 가능, 생략하면 전체)")
+    parser.add_argument("-o", "--output", help="저장할 파일 경로 (.csv 또는 .parquet, CSV는 '-'이면 표준출력)")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), help="출력 형식 (기본: 파일 확장자로 판단)")
+    parser.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY, help="동시 요청 수")
+    parser.add_argument("--cache-db", default=CACHE_DB_PATH, help="로컬 결과 캐시(SQLite) 경로")
+    parser.add_argument("--sync", action="store_true",
+                        help="증분 동기화: 지난 동기화 이후 등록/변경된 계약만 받아 로컬 미러에 반영 (-o를 주면 미러 내용 저장)")
+    parser.add_argument("--mirror-db", default=MIRROR_DB_PATH, help="증분 동기화 미러(SQLite) 경로")
+    parser.add_argument("--store", action="store_true", help="조회/동기화 결과를 로컬 보관소(연/월 Parquet)에 추가")
+    parser.add_argument("--from-store", action="store_true",
+                        help="API를 호출하지 않고 로컬 보관소에서 조회 (-k는 계약명 포함 조건, 생략 가능)")
+    parser.add_argument("--dataset-dir", default=DATASET_DIR, help="로컬 보관소(Parquet) 폴더")
+    parser.add_argument("--min-amount", type=int, help="--from-store: 총계약금액 하한")
+    parser.add_argument("--max-amount", type=int, help="--from-store: 총계약금액 상한")
+    parser.add_argument("--columns", help="--from-store: 읽을 컬럼 (쉼표 구분, 기본: 전체)")
+    parser.add_argument("--summary", help="저장한 결과의 기관/월/분류/업체별 요약을 XLSX로 함께 저장할 경로 (-o 필요)")
+    parser.add_argument("--metrics", default=METRICS_LOG_PATH,
+                        help="계측 이벤트(페이지별 지연/크기/재시도/파싱 시간 등)를 JSON lines로 덧붙일 파일")
+    parser.add_argument("-q", "--quiet", action="store_true", help="진행 상황을 출력하지 않음")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    keywords = list(args.keyword)
+    if args.keywords_file:
+        keywords += _read_keywords(args.keywords_file)
+    keywords = list(dict.fromkeys(k.strip() for k in keywords if k.strip()))
+    if not keywords and not args.from_store:
+        parser.error("용역명을 하나 이상 지정하세요 (-k 또는 --keywords-file).")
+    if args.from_store:
+        if args.sync or args.store:
+            parser.error("--from-store는 --sync/--store와 함께 쓸 수 없습니다.")
+        end, start = args.end, args.start
+        if not args.output:
+            parser.error("저장할 파일 경로(-o)를 지정하세요.")
+    elif args.sync:
+        end = args.end or date.today()
+        start = args.start
+    else:
+        end = args.end or date.today() - timedelta(days=1)
+        start = args.start or end - timedelta(days=364)
+        if not args.output and not args.store:
+            parser.error("저장할 파일 경로(-o) 또는 --store를 지정하세요.")
+    if start is not None and end is not None and start > end:
+        parser.error("시작일은 종료일보다 클 수 없습니다.")
+    if args.concurrency < 1:
+        parser.error("--concurrency는 1 이상이어야 합니다.")
+    if args.summary and not args.output:
+        parser.error("--summary는 저장할 파일 경로(-o)와 함께 지정하세요.")
+    if not SERVICE_KEY and not args.from_store:
+        parser.error("환경변수 NARA_SERVICE_KEY가 설정되어 있지 않습니다.")
+
+    fmt = None
+    if args.output:
+        fmt = args.format or ('csv' if args.output == '-' else args.output.rsplit('.', 1)[-1].lower())
+        if fmt not in OUTPUT_FORMATS:
+            parser.error("출력 형식을 알 수 없습니다. --format csv|parquet 을 지정하세요.")
+        if args.output == '-' and fmt != 'csv':
+            parser.error("표준출력(-)에는 CSV만 쓸 수 있습니다.")
+
+    queries = tuple(ContractQuery(k, cd) for k in keywords for cd in (args.institution or ['']))
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    started = time.perf_counter()
+    if args.from_store:
+        columns = [c.strip() for c in args.columns.split(',')] if args.columns else None
+        unknown = [c for c in columns or [] if c not in STORE_COLUMNS]
+        if unknown:
+            parser.error(f"알 수 없는 컬럼: {', '.join(unknown)}")
+        code_names = {cd: nm for nm, cd in INSTITUTION_TYPES.items()}
+        df = ContractDataset(args.dataset_dir).query(
+            columns=columns, start=start, end=end, keywords=keywords,
+            jurisdictions=[code_names[cd] for cd in args.institution] or None,
+            min_amount=args.min_amount, max_amount=args.max_amount,
+        )
+        _write_output(df, args.output, fmt, metrics=None)
+        log(f"{len(df)}건 저장 완료: {args.output} ({time.perf_counter() - started:.1f}초)")
+        if args.summary:
+            _write_summary(df, args.summary)
+            log(f"요약 저장 완료: {args.summary}")
+        return 0
+
+    callbacks = {
+        'on_progress': lambda done, total, rows_done, rows_total: log(
+            f"페이지 {done}/{total} ({rows_done}/{rows_total}건)"),
+        'on_retry': lambda attempt, error: log(f"재시도 {attempt}: {type(error).__name__}"),
+    }
+    metrics = Metrics(log_path=args.metrics) if args.metrics else None
+    client = ContractApiClient(pool_size=args.concurrency)
+    try:
+        if args.sync:
+            mirror = ContractMirror(args.mirror_db)
+            unsynced = [q for q in queries if mirror.synced_through(q) is None]
+            if unsynced and start is None:
+                parser.error(f"처음 동기화하는 검색 조건에는 --start가 필요합니다: {', '.join(q.contract_nm for q in unsynced)}")
+            changed = sync_contracts(queries, mirror, since=start, until=end, client=client,
+                                     max_workers=args.concurrency, metrics=metrics, **callbacks)
+            log(f"동기화 완료: 추가/갱신 {sum(changed.values())}건 ({time.perf_counter() - started:.1f}초)")
+            if not args.output and not args.store:
+                return 0
+            df = mirror.load(queries)
+        else:
+            df = fetch_contracts(start, end, queries, client=client, cache=ContractDayCache(args.cache_db),
+                                 max_workers=args.concurrency, metrics=metrics, **callbacks)
+    except (requests.exceptions.RequestException, NaraApiError, ET.ParseError) as e:
+        print(f"조회 실패: {describe_fetch_error(e)}", file=sys.stderr)
+        return 1
+
+    if args.store:
+        stored = ContractDataset(args.dataset_dir).write(df)
+        log(f"보관소 반영: {stored}건 ({args.dataset_dir})")
+        if not args.output:
+            return 0
+
+    df = ingest_contracts(df)
+    _write_output(df, args.output, fmt, metrics)
+    log(f"{len(df)}건 저장 완료: {args.output} ({time.perf_counter() - started:.1f}초)")
+    if args.summary:
+        _write_summary(df, args.summary)
+        log(f"요약 저장 완료: {args.summary}")
+    return 0
+
+
+def _write_output(df, output, fmt, metrics):
+    """df를 output('-'이면 표준출력)에 fmt 형식으로 저장. metrics가 있으면 'export' 이벤트 기록"""
+    export_started = time.perf_counter()
+    if output == '-':
+        write_export(df, OUTPUT_FORMATS[fmt], sys.stdout.buffer)
+    else:
+        with open(output, 'wb') as out:
+            write_export(df, OUTPUT_FORMATS[fmt], out)
+    if metrics is not None:
+        metrics.emit('export', fmt=OUTPUT_FORMATS[fmt], rows=len(df),
+                     seconds=round(time.perf_counter() - export_started, 4))
+
+
+def _write_summary(df, path):
+    """df의 요약 표(summarize_contracts)를 요약마다 시트 하나씩인 XLSX로 path에 저장"""
+    with open(path, 'wb') as out:
+        write_summary_xlsx(summarize_contracts(df), out)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
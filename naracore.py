@@ -0,0 +1,1752 @@
+# naracore.py
+# 나라장터 계약정보 조회 핵심 모듈: API 호출, 파싱, 캐시, 내보내기, 필터 (Streamlit 의존 없음)
+# naraweb.py(화면)와 naracli.py(명령줄)가 함께 사용한다.
+import os
+import io
+import hashlib
+import time
+import random
+import re
+import json
+import sqlite3
+import threading
+import unicodedata
+import uuid
+import weakref
+import requests
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+from urllib.parse import quote
+from dotenv import load_dotenv
+from openpyxl import Workbook
+
+# --- 환경 로드 (.env 사용 시) ---
+load_dotenv()  # 로컬에서 .env 파일을 사용하는 경우에 유용
+
+# --- 서비스 키 (환경변수에서 읽기) ---
+SERVICE_KEY = os.getenv("NARA_SERVICE_KEY")
+# 호출할 API 주소: 로컬 모의 서버(naramock.py) 등으로 바꾸려면 NARA_API_URL 지정
+DEFAULT_API_URL = 'http://apis.data.go.kr/1230000/ao/CntrctInfoService/getCntrctInfoListServcPPSSrch'
+API_URL = os.getenv("NARA_API_URL", DEFAULT_API_URL)
+MAX_API_ROWS = 999  # API가 한 번에 반환하는 최대 개수
+REQUEST_TIMEOUT = 30  # 페이지당 요청 타임아웃(초)
+MAX_RETRIES = 3  # 페이지당 재시도 횟수 (타임아웃/연결 오류, 429·5xx 응답)
+BACKOFF_BASE = 1.0  # 첫 재시도 대기 상한(초), 재시도마다 2배
+BACKOFF_MAX = 30.0  # 재시도 대기 상한(초)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# --- 로컬 저장 폴더 ---
+# 기본 API가 아닌 주소(모의 서버 등)를 쓰면 주소별 하위 폴더에 저장해 실제 계약 데이터와 섞이지 않게 함
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".nara_cache")
+if API_URL != DEFAULT_API_URL:
+    CACHE_DIR = os.path.join(CACHE_DIR, "endpoints", hashlib.sha1(API_URL.encode('utf-8')).hexdigest()[:12])
+
+# --- 로컬 결과 캐시 설정 ---
+CACHE_DB_PATH = os.getenv("NARA_CACHE_DB", os.path.join(CACHE_DIR, "contracts.sqlite3"))
+CACHE_RECENT_DAYS = 7  # 최근 N일은 계약이 추가/변경될 수 있으므로 TTL 적용
+CACHE_RECENT_TTL = 3600  # 최근 구간 캐시 유효 시간(초)
+INQRY_DIV_DEFAULT = '1'  # 일반 검색 조회구분 (디스크 캐시는 이 조회구분 결과만 보관)
+INQRY_DATE_FIELD = 'cntrctCnclsDate'  # inqryDiv=1 조회 기간의 기준 일자 컬럼 (캐시 일자 구분용)
+
+# --- 증분 동기화 설정 ---
+MIRROR_DB_PATH = os.getenv("NARA_MIRROR_DB", os.path.join(CACHE_DIR, "mirror.sqlite3"))
+# 등록/변경일시 기준으로 조회하는 조회구분 (API 명세가 다르면 NARA_SYNC_INQRY_DIV로 조정)
+SYNC_INQRY_DIV = os.getenv("NARA_SYNC_INQRY_DIV", "2")
+SYNC_OVERLAP_DAYS = 1  # 지난 동기화 기준일에서 이만큼 겹쳐 다시 조회 (당일 늦게 등록/변경된 건 보완)
+
+# --- 로컬 계약 보관소(Parquet) 설정 ---
+# 계약체결일자 연/월 단위로 나눠 저장하는 Parquet 폴더 (year=YYYY/month=MM/part.parquet)
+DATASET_DIR = os.getenv("NARA_DATASET_DIR", os.path.join(CACHE_DIR, "dataset"))
+
+# --- 조회 기간 분할 설정 ---
+# 구간의 totalCount가 이보다 크면 이 크기 안팎의 구간들로 나눠 다시 조회 (깊은 페이지 조회 방지, 나뉜 구간은 동시에 조회)
+# 조회 기간 전체를 한 구간으로 먼저 조회하므로, 결과가 적은 기간은 나누지 않고 몇 번의 요청으로 끝남: NARA_SHARD_MAX_ROWS로 조정 가능
+SHARD_MAX_ROWS = max(MAX_API_ROWS, int(os.getenv("NARA_SHARD_MAX_ROWS", str(MAX_API_ROWS * 5))))
+DEDUP_KEY = 'untyCntrctNo'  # 구간/검색 조건 간 중복 제거 기준 컬럼
+MATCHED_QUERY_COL = 'matchedQuery'  # 일괄 검색 시 행과 일치한 검색 조건
+# 동시에 요청할 최대 페이지 수: NARA_FETCH_CONCURRENCY로 조정 가능
+FETCH_CONCURRENCY = max(1, int(os.getenv("NARA_FETCH_CONCURRENCY", "4")))
+# 화면처럼 클라이언트(연결 풀) 하나를 여러 조회 작업이 함께 쓸 때 동시에 진행될 작업 수: NARA_SHARED_FETCH_JOBS로 조정 가능
+# 연결 풀 크기를 FETCH_CONCURRENCY × 이 값으로 잡아, 작업이 겹쳐도 keep-alive 연결을 버리고 새로 맺지 않게 함
+SHARED_FETCH_JOBS = max(1, int(os.getenv("NARA_SHARED_FETCH_JOBS", "4")))
+CANCEL_POLL_SECONDS = 0.2  # 취소 가능한 조회에서 취소 요청을 확인하는 간격(초)
+
+# --- 세션 간 공유 결과 캐시 설정 ---
+# 메모리에 보관하는 조회 결과 DataFrame 전체 크기 상한(MB): NARA_RESULT_CACHE_MB로 조정 가능
+RESULT_CACHE_MAX_BYTES = int(os.getenv("NARA_RESULT_CACHE_MB", "512")) * 1024 * 1024
+RESULT_CACHE_TTL = 3600  # 결과 유효 시간(초), 최근 구간 디스크 캐시 TTL과 같게
+
+# --- 세션 메모리 설정 ---
+# 세션 하나가 조회 결과 외에 보관하는 파생 데이터(표시용 프레임, 필터 색인, 내보내기 파일) 포함 상한(MB)
+SESSION_MEMORY_BUDGET = int(os.getenv("NARA_SESSION_MEMORY_MB", "256")) * 1024 * 1024
+SESSION_IDLE_SECONDS = 600  # 이 시간 동안 쓰지 않은 세션의 조회 결과는 디스크로 내보냄
+SPILL_DIR = os.getenv(
+    "NARA_SPILL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".nara_cache", "spill"),
+)
+
+# --- 계측 설정 ---
+# 지정하면 계측 이벤트(페이지별 지연/크기/재시도/파싱 시간 등)를 이 파일에 JSON lines로 덧붙임
+METRICS_LOG_PATH = os.getenv("NARA_METRICS_LOG")
+METRICS_KEEP = 2000  # 메모리에 보관할 최근 계측 이벤트 수 (요약 표시용)
+
+# --- 다운로드용 컬럼 한글 매핑 (필요하면 확장) ---
+DOWNLOAD_COLUMN_MAP = {
+    'resultCode': '결과코드',
+    'resultMsg': '결과메세지',
+    'numOfRows': '한 페이지 결과 수',
+    'pageNo': '페이지 번호',
+    'totalCount': '전체 결과 수',
+    'untyCntrctNo': '통합계약번호',
+    'bsnsDivNm': '업무구분명',
+    'dcsnCntrctNo': '확정계약번호',
+    'cntrctRefNo': '계약참조번호',
+    'cntrctNm': '계약명',
+    'cmmnCntrctYn': '공동계약여부',
+    'lngtrmCtnuDivNm': '장기계속구분명',
+    'cntrctCnclsDate': '계약체결일자',
+    'cntrctPrd': '계약기간',
+    'baseLawNm': '근거법률명',
+    'totCntrctAmt': '총계약금액',
+    'thtmCntrctAmt': '금차계약금액',
+    'grntymnyRate': '보증금률',
+    'cntrctInfoUrl': '계약정보URL',
+    'payDivNm': '지급구분명',
+    'reqNo': '요청번호',
+    'ntceNo': '공고번호',
+    'cntrctInsttCd': '계약기관코드',
+    'cntrctInsttNm': '계약기관명',
+    'cntrctInsttJrsdctnDivNm': '계약기관소관구분명',
+    'cntrctInsttChrgDeptNm': '계약기관담당부서명',
+    'cntrctInsttOfclNm': '계약기관담당자명',
+    'cntrctInsttOfclTelNo': '계약기관담당자전화번호',
+    'cntrctInsttOfclFaxNo': '계약기관담당자팩스번호',
+    'dminsttList': '수요기관목록',
+    'corpList': '업체목록',
+    'cntrctDtlInfoUrl': '계약상세정보URL',
+    'crdtrNm': '채권자명',
+    'baseDtls': '근거내역',
+    'cntrctCnclsMthdNm': '계약체결방법명',
+    'rgstDt': '등록일시',
+    'chgDt': '변경일시',
+    'dfrcmpnstRt': '지체상금율',
+    'wbgnDate': '착수일자',
+    'thtmScmpltDate': '금차완수일자',
+    'ttalScmpltDate': '총완수일자',
+    'pubPrcrmntLrgclsfcNm ': '공공조달대분류명',
+    'pubPrcrmntMidclsfcNm': '공공조달중분류명',
+    'pubPrcrmntClsfcNo': '공공조달분류번호',
+    'pubPrcrmntClsfcNm': '공공조달분류명',
+    'cntrctDate': '계약일자',
+    'infoBizYn': '정보화사업여부',
+    'matchedQuery': '검색조건',
+}
+DOWNLOAD_AMOUNT_ORIGINAL_COLS = ['totCntrctAmt', 'thtmCntrctAmt']
+AMOUNT_COLS = set(DOWNLOAD_AMOUNT_ORIGINAL_COLS)  # 파싱 시 int로 변환
+# 파싱 후 datetime64로 변환하는 일자/일시 컬럼
+DATE_COLS = {'cntrctCnclsDate', 'cntrctDate', 'wbgnDate', 'thtmScmpltDate', 'ttalScmpltDate', 'rgstDt', 'chgDt'}
+# 값의 종류가 적어 category로 저장하는 텍스트 컬럼
+CATEGORY_COLS = [
+    'bsnsDivNm', 'cmmnCntrctYn', 'lngtrmCtnuDivNm', 'baseLawNm', 'payDivNm',
+    'cntrctInsttCd', 'cntrctInsttNm', 'cntrctInsttJrsdctnDivNm', 'cntrctInsttChrgDeptNm',
+    'cntrctCnclsMthdNm', 'pubPrcrmntLrgclsfcNm', 'pubPrcrmntMidclsfcNm', 'pubPrcrmntClsfcNo',
+    'pubPrcrmntClsfcNm', 'infoBizYn', 'matchedQuery',
+]
+
+RESPONSE_HEADER_COLS = {'resultCode', 'resultMsg', 'numOfRows', 'pageNo', 'totalCount'}  # 계약 항목이 아닌 응답 필드
+# 보관소에 저장하는 컬럼 (계약 항목만, 검색 조건 표시 컬럼 제외)
+STORE_COLUMNS = [
+    c.strip() for c in DOWNLOAD_COLUMN_MAP if c not in RESPONSE_HEADER_COLS and c != 'matchedQuery'
+]
+
+# --- 화면 표시용 컬럼 매핑: 목록 표에 보여 줄 컬럼과 한글명 ---
+DISPLAY_COLUMN_MAP = {
+    'untyCntrctNo': '통합계약번호',
+    'bsnsDivNm': '업무구분명',
+    'cntrctNm': '계약명',
+    'cntrctCnclsDate': '계약체결일자',
+    'totCntrctAmt': '총계약금액',
+    'thtmCntrctAmt': '금차계약금액',
+    'cntrctInsttNm': '계약기관명',
+    'dminsttList': '수요기관목록',
+    'corpList': '업체목록',
+    'wbgnDate': '착수일자',
+    'ttalScmpltDate': '총완수일자',
+    'matchedQuery': '검색조건',  # 일괄 검색 결과에만 있음
+}
+
+# --- 집계 요약 설정 ---
+# corpList 항목 "[순번^계약업체구분^단독공동구분^업체명^대표자명^국적^사업자등록번호^지분율]"에서 쓰는 필드 위치
+CORP_FIELDS = {'corpNm': 3, 'bizno': 6, 'shareRate': 7}
+# dminsttList 항목 "[순번^수요기관코드^수요기관명]"에서 쓰는 필드 위치
+DMINSTT_FIELDS = {'dminsttCd': 1, 'dminsttNm': 2}
+SUMMARY_TOP_N = 20  # 업체별 요약에 남기는 상위 업체 수 (총계약금액 합계 기준)
+SUMMARY_MISSING = '(없음)'  # 그룹 값이 비어 있는 행의 표시
+# 요약 이름 -> (표시명/시트명, 그룹 컬럼 표시명)
+SUMMARY_LABELS = {
+    'institution': ('계약기관별', '계약기관명'),
+    'month': ('월별', '계약월'),
+    'category': ('공공조달분류별', '공공조달분류명'),
+    'vendor': ('업체별 상위', '업체명'),
+    'demand': ('수요기관별', '수요기관명'),
+}
+
+# --- 다운로드 형식: 표시명 -> (확장자, MIME) ---
+CSV_CHUNK_ROWS = 10000  # CSV를 쓸 때 한 번에 변환하는 행 수
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'XLSX': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+# --- 소관기관 코드 매핑 (첨부된 매핑 사용) ---
+INSTITUTION_TYPES = {
+    "국가기관": "01",
+    "지방자치단체": "02",
+    "교육기관": "03",
+    "정부투자기관": "05",
+    "임의기관": "07",
+    "공기업": "51",
+    "준정부기관": "52",
+    "기타공공기관": "53",
+    "지방공기업": "71",
+    "기타기관": "72",
+}
+
+
+# --- 계측: 구간별 소요 시간/크기 기록 ---
+class Metrics:
+    """계측 이벤트 수집기.
+
+    emit(event, **fields)는 {'ts', 'event', ...} 레코드를 최근 METRICS_KEEP개까지 보관하고,
+    log_path가 있으면 JSON 한 줄로 파일에 덧붙인다. 워커 스레드에서도 호출되므로 잠금으로
+    보호한다.
+    """
+
+    def __init__(self, log_path=METRICS_LOG_PATH, keep=METRICS_KEEP):
+        self.log_path = log_path
+        self.events = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+
+    def emit(self, event, **fields):
+        record = {'ts': round(time.time(), 3), 'event': event, **fields}
+        with self._lock:
+            self.events.append(record)
+            if self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        return record
+
+    @contextmanager
+    def timer(self, event, **fields):
+        """블록 실행 시간을 seconds로 기록. 블록 안에서 yield된 dict에 필드를 추가할 수 있음"""
+        started = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.emit(event, seconds=round(time.perf_counter() - started, 4), **fields)
+
+    def summary(self):
+        """이벤트 종류별 횟수와 seconds/bytes/rows/retries 합계"""
+        totals = {}
+        with self._lock:
+            events = list(self.events)
+        for record in events:
+            total = totals.setdefault(record['event'], {'count': 0})
+            total['count'] += 1
+            for field in ('seconds', 'http_seconds', 'parse_seconds', 'bytes', 'rows', 'retries'):
+                if field in record:
+                    total[field] = round(total.get(field, 0) + record[field], 4)
+        return totals
+
+
+# --- 응답 파싱: 컬럼 단위 조립 ---
+class FetchCancelled(Exception):
+    """cancel 이벤트로 조회가 중단됨"""
+
+
+class NaraApiError(Exception):
+    """API가 정상 코드(resultCode '00')가 아닌 응답을 반환한 경우"""
+
+
+class ColumnBatch:
+    """행 dict 대신 컬럼별 값 목록으로 모은 조회 결과.
+
+    모든 컬럼 목록의 길이는 length와 같고, 해당 행에 없는 값은 None이다.
+    금액 컬럼은 파싱 시점에 int로 바뀌어 있고, 나머지는 API 문자열 그대로다.
+    """
+
+    __slots__ = ('columns', 'length')
+
+    def __init__(self, columns=None, length=0):
+        self.columns = columns if columns is not None else {}
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    @classmethod
+    def from_rows(cls, rows):
+        names = list(dict.fromkeys(c for row in rows for c in row))
+        return cls({c: [row.get(c) for row in rows] for c in names}, len(rows))
+
+    def rows(self):
+        """행 단위 dict (값이 None인 컬럼은 생략)"""
+        names = list(self.columns)
+        for values in zip(*(self.columns[c] for c in names)):
+            yield {c: v for c, v in zip(names, values) if v is not None}
+
+    def column(self, name):
+        values = self.columns.get(name)
+        return values if values is not None else [None] * self.length
+
+    def take(self, indices):
+        return ColumnBatch({c: [values[i] for i in indices] for c, values in self.columns.items()}, len(indices))
+
+    @classmethod
+    def concat(cls, batches):
+        names = list(dict.fromkeys(c for batch in batches for c in batch.columns))
+        columns = {c: [] for c in names}
+        for batch in batches:
+            for c in names:
+                columns[c].extend(batch.column(c))
+        return cls(columns, sum(len(batch) for batch in batches))
+
+    def to_json(self):
+        return json.dumps({'length': self.length, 'columns': self.columns}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls(data['columns'], data['length'])
+
+
+def _to_int(text):
+    """금액 문자열('1,234,000' 등)을 int로, 비었거나 숫자가 아니면 None"""
+    if text is None:
+        return None
+    text = text.replace(',', '').strip()
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return int(float(text))
+        except ValueError:
+            return None
+
+
+def _parse_page(content):
+    """응답 XML 한 페이지를 iterparse로 읽어 (totalCount, ColumnBatch)로 변환.
+
+    트리 전체를 만들지 않고 <item>이 닫힐 때마다 값을 컬럼 목록에 붙인 뒤 요소를 비운다.
+    정상 header(resultCode '00')와 body가 없는 응답(게이트웨이 오류 페이지 등)은 NaraApiError로,
+    빈 결과로 취급하지 않는다 (캐시/동기화 기록에 '조회 완료'로 남지 않도록).
+    """
+    columns = {}
+    length = 0
+    total_count = 0
+    result_code = result_msg = None
+    has_header = has_body = False
+    gateway = {}  # <OpenAPI_ServiceResponse><cmmMsgHeader> 오류 응답의 필드
+
+    for _, elem in ET.iterparse(io.BytesIO(content), events=('end',)):
+        tag = elem.tag
+        if tag == 'item':
+            for child in elem:
+                values = columns.get(child.tag)
+                if values is None:
+                    values = columns[child.tag] = [None] * length
+                elif len(values) > length:
+                    continue  # 같은 태그가 한 item에 두 번 나오면 첫 값만 사용
+                values.append(_to_int(child.text) if child.tag in AMOUNT_COLS else child.text)
+            length += 1
+            for values in columns.values():
+                if len(values) < length:
+                    values.append(None)
+            elem.clear()
+        elif tag == 'resultCode':
+            result_code = elem.text or ''
+        elif tag == 'resultMsg':
+            result_msg = elem.text or ''
+        elif tag == 'header':
+            if result_code != '00':
+                raise NaraApiError(f"API 오류: {result_msg or ''} ({result_code or ''})")
+            has_header = True
+        elif tag == 'body':
+            has_body = True
+        elif tag == 'totalCount':
+            total_count = int(elem.text) if elem.text else 0
+        elif tag in ('errMsg', 'returnAuthMsg', 'returnReasonCode'):
+            gateway[tag] = elem.text or ''
+
+    if gateway or not has_header:
+        raise NaraApiError(
+            f"API 오류: {gateway.get('returnAuthMsg') or gateway.get('errMsg') or '응답에 header가 없습니다'}"
+            f" ({gateway.get('returnReasonCode', '')})"
+        )
+    if not has_body:
+        raise NaraApiError(f"API 오류: 응답에 body가 없습니다 ({result_code})")
+    return total_count, ColumnBatch(columns, length)
+
+
+def _build_frame(batch):
+    """ColumnBatch를 컬럼별로 타입을 지정해 DataFrame으로 변환 (금액: Int64, 일자: datetime64)"""
+    data = {}
+    for col, values in batch.columns.items():
+        if col in AMOUNT_COLS:
+            data[col] = pd.array(values, dtype='Int64')
+        elif col in DATE_COLS:
+            data[col] = pd.to_datetime(pd.Series(values, dtype=object), format='ISO8601', errors='coerce')
+        else:
+            data[col] = values
+    return pd.DataFrame(data, index=pd.RangeIndex(batch.length))
+
+
+# --- SQLite 공통 ---
+@contextmanager
+def _sqlite_connection(path):
+    """path의 SQLite 연결 (블록이 정상 종료되면 commit, 예외면 rollback, 끝나면 닫음)"""
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _prepare_sqlite(path):
+    """폴더를 만들고 WAL 모드로 설정한 path의 연결 (테이블 생성용)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _sqlite_connection(path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        yield conn
+
+
+# --- 로컬 결과 캐시: (용역명, 소관기관코드, 일자) 단위 SQLite 저장 ---
+class ContractDayCache:
+    """검색어·소관기관·일자별로 API 결과(ColumnBatch)를 보관하는 디스크 캐시.
+
+    지난 일자는 한 번 받으면 바뀌지 않는 것으로 보고 계속 재사용하고, 최근
+    CACHE_RECENT_DAYS일은 CACHE_RECENT_TTL초가 지나면 다시 받는다. 결과가 0건인
+    일자도 빈 목록으로 저장해 '이미 조회함'을 표시한다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with _prepare_sqlite(path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS day_batches ("
+                " cntrct_nm TEXT NOT NULL, instt_cd TEXT NOT NULL, day TEXT NOT NULL,"
+                " batch TEXT NOT NULL, fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (cntrct_nm, instt_cd, day))"
+            )
+
+    def missing_days(self, key, days, now=None):
+        """days(YYYYMMDD 목록) 중 새로 받아야 하는 일자 목록"""
+        if not days:
+            return []
+        now = time.time() if now is None else now
+        with _sqlite_connection(self.path) as conn:
+            fetched = dict(conn.execute(
+                "SELECT day, fetched_at FROM day_batches"
+                " WHERE cntrct_nm = ? AND instt_cd = ? AND day BETWEEN ? AND ?",
+                (*key, days[0], days[-1]),
+            ))
+        recent_from = (date.today() - timedelta(days=CACHE_RECENT_DAYS)).strftime("%Y%m%d")
+        return [
+            d for d in days
+            if d not in fetched or (d >= recent_from and now - fetched[d] > CACHE_RECENT_TTL)
+        ]
+
+    def store(self, key, batch_by_day):
+        now = time.time()
+        with _sqlite_connection(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO day_batches (cntrct_nm, instt_cd, day, batch, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(*key, day, batch.to_json(), now) for day, batch in batch_by_day.items()],
+            )
+
+    def load(self, key, first_day, last_day):
+        """first_day~last_day 구간의 결과를 일자 순서대로 이어 하나의 ColumnBatch로 반환"""
+        with _sqlite_connection(self.path) as conn:
+            cursor = conn.execute(
+                "SELECT batch FROM day_batches"
+                " WHERE cntrct_nm = ? AND instt_cd = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (*key, first_day, last_day),
+            )
+            return ColumnBatch.concat([ColumnBatch.from_json(text) for (text,) in cursor])
+
+
+def _day_keys(start_dt, end_dt):
+    """시작~종료일(포함)의 YYYYMMDD 목록"""
+    return [(start_dt + timedelta(days=i)).strftime("%Y%m%d") for i in range((end_dt - start_dt).days + 1)]
+
+
+def _contiguous_runs(days):
+    """정렬된 YYYYMMDD 목록을 연속 구간 [(시작 date, 종료 date), ...]으로 묶음"""
+    runs = []
+    for d in days:
+        day = datetime.strptime(d, "%Y%m%d").date()
+        if runs and runs[-1][1] + timedelta(days=1) == day:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+def _bucket_by_day(batch, run_start, run_end):
+    """구간 조회 결과를 INQRY_DATE_FIELD 기준 일자별 ColumnBatch로 나눔 (구간 밖/빈 값은 가장 가까운 경계 일자로)"""
+    days = _day_keys(run_start, run_end)
+    indices = {d: [] for d in days}
+    for i, value in enumerate(batch.column(INQRY_DATE_FIELD)):
+        day = ''.join(ch for ch in (value or '') if ch.isdigit())[:8]
+        if day not in indices:
+            day = days[-1] if len(day) == 8 and day > days[-1] else days[0]
+        indices[day].append(i)
+    return {d: batch.take(idx) for d, idx in indices.items()}
+
+
+# --- 조회 기간 분할(샤딩) ---
+class ContractQuery(NamedTuple):
+    """한 번의 검색 조건 (디스크 캐시 키로도 사용)"""
+    contract_nm: str
+    instt_cd: str = ''
+
+
+def _split_shard(shard, parts=2):
+    """결과가 너무 많은 구간을 일수가 거의 같은 parts개(최대 일수만큼) 구간으로 나눔"""
+    shard_start, shard_end = shard
+    days = (shard_end - shard_start).days + 1
+    parts = max(1, min(parts, days))
+    bounds = [shard_start + timedelta(days=days * i // parts) for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1] - timedelta(days=1)) for i in range(parts)]
+
+
+def _query_label(query):
+    """검색 조건 표시용 이름: '용역명' 또는 '용역명 / 소관기관명'"""
+    if not query.instt_cd:
+        return query.contract_nm
+    instt_nm = next((nm for nm, cd in INSTITUTION_TYPES.items() if cd == query.instt_cd), query.instt_cd)
+    return f"{query.contract_nm} / {instt_nm}"
+
+
+def _merge_query_batches(query_batches, tag=False):
+    """[(query, ColumnBatch), ...]를 이어 붙이며 DEDUP_KEY 중복을 제거 (키가 없는 행은 그대로 둠).
+
+    구간 경계나 여러 검색 조건에 걸쳐 중복된 계약은 처음 나온 행만 남긴다. tag가 참이면
+    MATCHED_QUERY_COL에 그 계약과 일치한 검색 조건을 모두 ', '로 이어 기록한다.
+    """
+    first_pos = {}
+    labels = []
+    kept = []
+    for query, batch in query_batches:
+        label = _query_label(query)
+        keep = []
+        for i, key in enumerate(batch.column(DEDUP_KEY)):
+            if key and key in first_pos:
+                matched = labels[first_pos[key]]
+                if label not in matched:
+                    matched.append(label)
+                continue
+            if key:
+                first_pos[key] = len(labels)
+            labels.append([label])
+            keep.append(i)
+        kept.append(batch if len(keep) == len(batch) else batch.take(keep))
+
+    merged = ColumnBatch.concat(kept)
+    if tag:
+        merged.columns[MATCHED_QUERY_COL] = [', '.join(matched) for matched in labels]
+    return merged
+
+
+# --- API 호출 함수: 페이지네이션 포함 ---
+_SERVICE_KEY_PARAM = re.compile(r'(serviceKey=)[^&\s\'"]+')
+
+
+def _redact_service_key(text, service_key=None):
+    """text(예외 메시지 등)에 든 serviceKey 값을 ***로 가림"""
+    text = _SERVICE_KEY_PARAM.sub(r'\1***', text)
+    if service_key:
+        text = text.replace(service_key, '***').replace(quote(service_key, safe=''), '***')
+    return text
+
+
+def describe_fetch_error(error):
+    """조회 오류를 사용자에게 보여 줄 문구로 변환 (요청 주소와 serviceKey는 넣지 않음)"""
+    if isinstance(error, requests.exceptions.Timeout):
+        return "타임아웃 - 나중에 다시 시도해주세요."
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return f"네트워크/API 오류: HTTP {error.response.status_code} 응답"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "네트워크 오류: API 서버에 연결하지 못했습니다."
+    if isinstance(error, requests.exceptions.RequestException):
+        return f"네트워크/API 오류: {type(error).__name__}"
+    if isinstance(error, NaraApiError):
+        return str(error)
+    if isinstance(error, ET.ParseError):
+        return "XML 파싱 오류 - 응답 확인 필요"
+    return f"알 수 없는 오류: {type(error).__name__}"
+
+
+class ContractApiClient:
+    """계약정보 API 전용 HTTP 클라이언트.
+
+    keep-alive 연결 풀을 가진 requests.Session 하나를 재사용하고, 타임아웃/연결 오류와
+    429·5xx 응답은 지터를 섞은 지수 백오프로 재시도한다. 워커 스레드에서도 호출되므로
+    화면에 직접 출력하지 않고 on_retry 콜백으로만 알린다. 요청 예외는 메시지의 serviceKey를
+    가린 같은 종류의 예외로 바꿔 발생시킨다(원래 예외는 __cause__).
+    """
+
+    def __init__(self, api_url=API_URL, service_key=SERVICE_KEY, pool_size=FETCH_CONCURRENCY,
+                 timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES):
+        self.api_url = api_url
+        self.service_key = service_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.last_response = None  # 디버그 표시용 마지막 응답 (스레드 간 경쟁 가능, 참고용)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _backoff(self, attempt, response=None):
+        """attempt번째 재시도 전 대기 시간(초): 429의 Retry-After를 우선하고, 없으면 지수 백오프 + 지터"""
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            return min(BACKOFF_MAX, float(retry_after))
+        cap = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def _redacted(self, error):
+        """error 메시지의 serviceKey를 가린 같은 종류의 예외 (원래 예외를 __cause__로 연결)"""
+        redacted = type(error)(_redact_service_key(str(error), self.service_key),
+                               request=error.request, response=error.response)
+        redacted.__cause__ = error
+        return redacted
+
+    def get(self, params, on_retry=None):
+        """params(serviceKey 제외)로 한 번 요청하고 성공한 Response를 반환. 재시도가 모두 실패하면 마지막 예외를 발생"""
+        params = dict(params, serviceKey=self.service_key)
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+                self.last_response = response
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response
+                error = requests.exceptions.HTTPError(f"{response.status_code} 응답", response=response)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                error = self._redacted(e)
+            except requests.exceptions.RequestException as e:
+                raise self._redacted(e)
+
+            if attempt >= self.max_retries:
+                raise error
+            attempt += 1
+            if on_retry is not None:
+                on_retry(attempt, error)
+            time.sleep(self._backoff(attempt, response))
+
+
+def _fetch_page(client, params, page_no, on_retry=None, metrics=None):
+    """한 페이지를 요청(재시도 포함)해 (totalCount, ColumnBatch)를 반환. metrics가 있으면 'page' 이벤트 기록"""
+    retries = 0
+
+    def _on_retry(attempt, error):
+        nonlocal retries
+        retries = attempt
+        if on_retry is not None:
+            on_retry(attempt, error)
+
+    started = time.perf_counter()
+    response = client.get(dict(params, pageNo=page_no), on_retry=_on_retry)
+    received = time.perf_counter()
+    total_count, batch = _parse_page(response.content)
+    if metrics is not None:
+        finished = time.perf_counter()
+        metrics.emit(
+            'page',
+            begin=params['inqryBgnDate'], end=params['inqryEndDate'], page_no=page_no,
+            http_seconds=round(received - started, 4),
+            parse_seconds=round(finished - received, 4),
+            bytes=len(response.content), rows=len(batch), retries=retries,
+            rows_per_s=round(len(batch) / max(finished - started, 1e-6)),
+        )
+    return total_count, batch
+
+
+def _shard_params(query, shard, inqry_div=INQRY_DIV_DEFAULT):
+    params = {
+        'numOfRows': MAX_API_ROWS,
+        'inqryDiv': inqry_div,
+        'type': 'xml',
+        'inqryBgnDate': shard[0].strftime("%Y%m%d"),
+        'inqryEndDate': shard[1].strftime("%Y%m%d"),
+        'cntrctNm': query.contract_nm
+    }
+    # API가 요구하는 소관기관 파라미터명으로 전송
+    if query.instt_cd:
+        params['insttClsfcCd'] = query.instt_cd
+    return params
+
+
+def _run_shards(client, tasks, on_shard_done, max_workers=FETCH_CONCURRENCY, inqry_div=INQRY_DIV_DEFAULT,
+                on_retry=None, on_progress=None, metrics=None, on_page=None, cancel=None,
+                shard_max_rows=SHARD_MAX_ROWS):
+    """(검색 조건, 구간) 작업들을 하나의 스레드 풀에서 동시에 조회.
+
+    각 구간은 1페이지로 totalCount를 확인한 뒤, shard_max_rows를 넘으면 totalCount에 맞춰
+    그 크기 안팎의 구간들로 나눠 다시 조회하고, 아니면 나머지 페이지를 풀에 추가한다. 구간의 모든 페이지가 모이면
+    페이지 순서대로 이어 on_shard_done(query, shard, batch)을 호출한다. 스케줄링과
+    콜백은 호출한 스레드에서만 실행된다. on_progress(pages_done, pages_total, rows_done,
+    rows_total)의 rows_total은 지금까지 확인한 구간 totalCount의 합이다. on_page(query, shard,
+    batch)는 구간이 끝나기 전에도 페이지가 도착할 때마다 호출되고, cancel(threading.Event)이
+    설정되면 남은 요청을 버리고 FetchCancelled를 발생시킨다.
+    """
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}
+    shard_pages = {}
+    pages_done = rows_done = rows_total = 0
+
+    def submit(query, shard, page_no):
+        future = pool.submit(_fetch_page, client, _shard_params(query, shard, inqry_div), page_no, on_retry, metrics)
+        pending[future] = (query, shard, page_no)
+
+    try:
+        for query, shard in tasks:
+            submit(query, shard, 1)
+
+        while pending:
+            if cancel is not None and cancel.is_set():
+                raise FetchCancelled("조회를 취소했습니다.")
+            done, _ = wait(pending, timeout=CANCEL_POLL_SECONDS if cancel is not None else None,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                query, shard, page_no = pending.pop(future)
+                total_count, batch = future.result()
+                pages_done += 1
+
+                if page_no == 1:
+                    if total_count > shard_max_rows and shard[0] < shard[1]:
+                        for sub_shard in _split_shard(shard, -(-total_count // shard_max_rows)):
+                            submit(query, sub_shard, 1)
+                        continue
+                    page_count = max(1, -(-total_count // MAX_API_ROWS)) if len(batch) >= MAX_API_ROWS else 1
+                    shard_pages[(query, shard)] = (page_count, {})
+                    rows_total += total_count
+                    for p in range(2, page_count + 1):
+                        submit(query, shard, p)
+
+                page_count, pages = shard_pages[(query, shard)]
+                pages[page_no] = batch
+                rows_done += len(batch)
+                if on_page is not None:
+                    on_page(query, shard, batch)
+                if len(pages) == page_count:
+                    del shard_pages[(query, shard)]
+                    on_shard_done(query, shard, ColumnBatch.concat([pages[p] for p in sorted(pages)]))
+
+            if on_progress is not None:
+                on_progress(pages_done, pages_done + len(pending), rows_done, max(rows_total, rows_done))
+    finally:
+        # 오류로 빠져나온 경우 아직 시작하지 않은 페이지 요청은 취소
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_contracts(start_dt, end_dt, queries, client=None, cache=None, max_workers=FETCH_CONCURRENCY,
+                    on_progress=None, on_retry=None, metrics=None, on_page=None, cancel=None, on_cached=None):
+    """queries(ContractQuery 목록)의 start_dt~end_dt 결과를 모두 조회해 합친 DataFrame.
+
+    캐시에 없는(또는 최근 구간에서 만료된) 일자만 (검색 조건 × 이어진 일자 구간) 작업으로
+    하나의 스레드 풀에서 함께 조회하고 (결과가 많은 구간은 _run_shards가 나눔), 구간이 끝날 때마다 캐시에 저장한다. 여러
+    조건을 검색하면 MATCHED_QUERY_COL에 각 행과 일치한 조건이 표시된다. API/네트워크
+    오류는 그대로 발생한다 (NaraApiError, requests.RequestException, ET.ParseError).
+    metrics가 있으면 페이지별 'page', 전체 'fetch', 'build_frame' 이벤트를 기록한다.
+    on_page/cancel은 _run_shards 참고 (취소되면 FetchCancelled, 끝난 구간은 캐시에 남음).
+    on_cached(query, batch)는 요청을 보내기 전에 캐시에 있는 일자 결과로 검색 조건마다 호출된다.
+    """
+    started = time.perf_counter()
+    client = client if client is not None else ContractApiClient(pool_size=max_workers)
+    cache = cache if cache is not None else ContractDayCache(CACHE_DB_PATH)
+    days = _day_keys(start_dt, end_dt)
+
+    tasks = []
+    for query in queries:
+        missing = cache.missing_days(query, days)
+        tasks += [(query, run) for run in _contiguous_runs(missing)]
+        if on_cached is not None:
+            missing = set(missing)
+            cached_runs = _contiguous_runs([d for d in days if d not in missing])
+            on_cached(query, ColumnBatch.concat([
+                cache.load(query, run_start.strftime("%Y%m%d"), run_end.strftime("%Y%m%d"))
+                for run_start, run_end in cached_runs
+            ]))
+    if tasks:
+        _run_shards(
+            client, tasks,
+            # 구간이 끝날 때마다 저장: 한 구간이 실패해도 나머지는 다음 검색에서 재사용
+            on_shard_done=lambda q, shard, batch: cache.store(q, _bucket_by_day(batch, *shard)),
+            max_workers=max_workers,
+            on_retry=on_retry,
+            on_progress=on_progress,
+            metrics=metrics,
+            on_page=on_page,
+            cancel=cancel,
+        )
+
+    batch = _merge_query_batches(
+        [(query, cache.load(query, days[0], days[-1])) for query in queries],
+        tag=len(queries) > 1,
+    )
+    if metrics is None:
+        return _build_frame(batch)
+    with metrics.timer('build_frame', rows=len(batch)):
+        df = _build_frame(batch)
+    elapsed = time.perf_counter() - started
+    metrics.emit('fetch', seconds=round(elapsed, 4), rows=len(df), queries=len(queries), shards=len(tasks),
+                 rows_per_s=round(len(df) / max(elapsed, 1e-6)))
+    return df
+
+
+# --- 세션 간 공유 결과 캐시: LRU + 크기 상한 + 동일 요청 합치기 ---
+class _Flight:
+    """진행 중인 계산 하나: 먼저 시작한 스레드가 끝나면 done이 설정됨"""
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def _frame_nbytes(value):
+    return int(value.memory_usage(index=True, deep=True).sum()) if isinstance(value, pd.DataFrame) else 0
+
+
+class ResultCache:
+    """프로세스 전체(모든 세션)가 공유하는 조회 결과 캐시.
+
+    최근에 쓴 순서(LRU)로 보관하다가 결과 크기 합이 max_bytes를 넘으면 오래된 것부터 버리고,
+    ttl초가 지난 결과는 다시 계산한다. 같은 키를 여러 스레드가 동시에 요청하면 처음 요청한
+    스레드만 계산하고 나머지는 그 결과(또는 예외)를 함께 받는다. 오류는 캐시하지 않는다.
+    반환한 값은 여러 세션이 함께 쓰므로 호출한 쪽에서 수정하면 안 된다.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL, sizeof=_frame_nbytes):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self.hits = self.misses = self.coalesced = 0
+        self._entries = OrderedDict()  # key -> (저장 시각, 크기, 값)
+        self._inflight = {}  # key -> _Flight
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, on_wait=None):
+        """key의 결과를 반환. 없으면 compute()로 계산하고, 이미 계산 중이면 on_wait() 호출 후 기다림"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if on_wait is not None:
+                on_wait()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            self._store(key, flight.value)
+            return flight.value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def _store(self, key, value):
+        nbytes = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if nbytes > self.max_bytes:
+                return  # 상한보다 큰 결과는 보관하지 않음 (요청한 쪽에만 반환)
+            self._entries[key] = (time.monotonic(), nbytes, value)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted
+
+    def purge_expired(self, now=None):
+        """ttl이 지난 결과를 버리고 놓은 크기(바이트)를 반환 (크기 상한에 걸리지 않아도 메모리를 돌려주도록)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = [key for key, (stored, _, _) in self._entries.items() if now - stored > self.ttl]
+            freed = sum(self._entries.pop(key)[1] for key in expired)
+            self.total_bytes -= freed
+        return freed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                'in_flight': len(self._inflight),
+            }
+
+
+# --- 세션 조회 결과: 오래 쓰지 않으면 디스크로 내보내고 다시 쓸 때 읽기 ---
+class SpillableFrame:
+    """세션이 보관하는 조회 결과 DataFrame(수정하지 않음) 하나.
+
+    spill()하면 Parquet 파일로 내보내고 메모리의 참조를 놓으며, 다음에 frame을 읽을 때
+    파일에서 다시 읽는다 (category/Int64/datetime 타입과 행 순서 유지). 같은 프레임을 다른
+    곳(ResultCache, 다른 세션)이 아직 잡고 있으면 파일 대신 그 프레임에 다시 연결하므로
+    사본이 생기지 않고 id()도 그대로다. 파일은 객체가 사라질 때 지운다. rows/columns/nbytes는
+    내보낸 뒤에도 읽을 수 있다.
+    """
+
+    def __init__(self, frame, spill_dir=SPILL_DIR):
+        self._frame = frame
+        self.rows = len(frame)
+        self.columns = list(frame.columns)
+        self.dtypes = frame.dtypes
+        self.nbytes = _frame_nbytes(frame)
+        self.last_used = time.monotonic()
+        self._spill_path = os.path.join(spill_dir, f"{uuid.uuid4().hex}.parquet")
+        self._written = False
+        self._spilled_ref = None  # 내보낸 프레임의 약한 참조 (다른 곳에 살아 있으면 다시 연결)
+        self._lock = threading.Lock()
+        weakref.finalize(self, _remove_file, self._spill_path)
+
+    @property
+    def frame(self):
+        with self._lock:
+            self.last_used = time.monotonic()
+            if self._frame is None:
+                self._frame = self._spilled_ref() if self._spilled_ref is not None else None
+            if self._frame is None:
+                frame = pd.read_parquet(self._spill_path)
+                # 값이 모두 비어 있는 일자 컬럼 등은 단위가 달라질 수 있어 원래 타입으로 맞춤
+                changed = {c: t for c, t in self.dtypes.items() if frame[c].dtype != t}
+                self._frame = frame.astype(changed) if changed else frame
+            self._spilled_ref = None
+            return self._frame
+
+    @property
+    def spilled(self):
+        return self._frame is None
+
+    def peek(self):
+        """메모리에 있는 프레임 또는 None (파일에서 다시 읽지 않고 last_used도 바꾸지 않음)"""
+        return self._frame
+
+    def spill(self):
+        """메모리의 프레임을 파일로 내보내고 놓음. 놓은 크기(바이트)를 반환 (pyarrow 필요)"""
+        with self._lock:
+            if self._frame is None or self.rows == 0:
+                return 0
+            if not self._written:
+                os.makedirs(os.path.dirname(self._spill_path), exist_ok=True)
+                tmp_path = self._spill_path + ".tmp"
+                self._frame.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, self._spill_path)
+                self._written = True  # 프레임은 바뀌지 않으므로 한 번만 씀
+            self._spilled_ref = weakref.ref(self._frame)
+            self._frame = None
+            # 다른 곳이 아직 잡고 있으면 실제로 놓은 메모리는 없음
+            return 0 if self._spilled_ref() is not None else self.nbytes
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class FrameSpiller:
+    """프로세스의 모든 세션 조회 결과(SpillableFrame)를 추적해 오래 쓰지 않은 것을 디스크로 내보냄"""
+
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._frames = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def track(self, spillable):
+        with self._lock:
+            self._frames.add(spillable)
+        return spillable
+
+    def spill_idle(self, now=None):
+        """idle_seconds 넘게 쓰지 않은 조회 결과를 내보내고 놓은 크기 합을 반환"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            frames = list(self._frames)
+        return sum(f.spill() for f in frames if not f.spilled and now - f.last_used > self.idle_seconds)
+
+    def stats(self):
+        with self._lock:
+            frames = list(self._frames)
+        in_memory = [f for f in frames if not f.spilled]
+        return {
+            'sessions': len(frames), 'in_memory': len(in_memory),
+            'in_memory_bytes': sum(f.nbytes for f in in_memory),
+            'spilled_bytes': sum(f.nbytes for f in frames if f.spilled),
+        }
+
+
+# --- 백그라운드 조회 작업 ---
+class FetchJob:
+    """fetch_contracts를 백그라운드 스레드에서 실행하는 조회 작업.
+
+    캐시에 있던 일자 결과를 먼저 담고 도착한 페이지를 이어 모아 두므로 끝나기 전에도
+    partial_frame()으로 지금까지의 결과를 볼 수 있고, cancel()로 중단할 수 있다. 작업 스레드는 화면에 출력하지 않으며, 화면은 재실행마다
+    progress/pages/finished 등 상태만 읽는다. result_cache(ResultCache)가 있으면 같은 조건의
+    조회를 다른 작업과 함께 쓴다. 최종 결과(result)는 ingest_contracts까지 적용된 프레임이다.
+    """
+
+    def __init__(self, start_dt, end_dt, queries, client=None, cache=None, result_cache=None,
+                 metrics=None, max_workers=FETCH_CONCURRENCY):
+        self.key = (start_dt, end_dt, tuple(queries))
+        self.result_cache = result_cache
+        self._fetch_kwargs = {'client': client, 'cache': cache, 'max_workers': max_workers, 'metrics': metrics}
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiting = False  # 다른 작업이 같은 조건을 조회 중이라 그 결과를 기다리는 중
+        self.progress = (0, 0, 0, 0)  # (pages_done, pages_total, rows_done, rows_total)
+        self.retries = 0
+        self.pages = 0  # 지금까지 받은 결과 묶음(캐시 결과 + 페이지) 수 (부분 결과 갱신 여부 판단용)
+        self._batches = []  # 아직 부분 결과에 붙이지 않은 (query, ColumnBatch)
+        self._partial = None  # 지금까지의 부분 결과 (ingest_contracts 전)
+        self._partial_keys = set()  # 부분 결과에 들어간 DEDUP_KEY
+        self._lock = threading.Lock()
+        self._partial_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='nara-fetch', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def finished(self):
+        """끝났거나, 다른 작업의 결과를 기다리던 중 취소됨"""
+        return self.done.is_set() or (self.waiting and self.cancel_event.is_set())
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set() and (self.result is None or self.waiting)
+
+    def partial_frame(self):
+        """지금까지 받은 결과로 만든 프레임 (검색 조건 간 중복 제거, ingest_contracts 적용).
+
+        지난 호출 뒤에 받은 묶음만 변환해 뒤에 붙이므로 이전 결과의 행은 같은 위치에 그대로 있다
+        (이미 들어간 계약이 다른 검색 조건으로 다시 오면 일치 조건 표시는 갱신하지 않음).
+        """
+        with self._partial_lock:
+            with self._lock:
+                pending, self._batches = self._batches, []
+            if pending or self._partial is None:
+                batch = _merge_query_batches(pending, tag=len(self.key[2]) > 1)
+                keep = [i for i, key in enumerate(batch.column(DEDUP_KEY)) if not key or key not in self._partial_keys]
+                batch = batch if len(keep) == len(batch) else batch.take(keep)
+                self._partial_keys.update(key for key in batch.column(DEDUP_KEY) if key)
+                frame = _build_frame(batch)
+                if self._partial is None or not len(self._partial):
+                    self._partial = frame
+                elif len(frame):
+                    self._partial = pd.concat([self._partial, frame], ignore_index=True)
+            # category 변환은 얕은 복사본에만 적용 (다음 호출에서 새 행과 다시 합칠 수 있도록)
+            return ingest_contracts(self._partial.copy(deep=False))
+
+    def _add_batch(self, query, batch):
+        with self._lock:
+            self._batches.append((query, batch))
+            self.pages += 1
+
+    def _on_cached(self, query, batch):
+        if len(batch):
+            self._add_batch(query, batch)
+
+    def _on_page(self, query, shard, batch):
+        self._add_batch(query, batch)
+
+    def _on_progress(self, *progress):
+        self.progress = progress
+
+    def _on_retry(self, attempt, error):
+        self.retries += 1
+
+    def _on_wait(self):
+        self.waiting = True
+
+    def _fetch(self):
+        start_dt, end_dt, queries = self.key
+        return ingest_contracts(fetch_contracts(
+            start_dt, end_dt, queries,
+            on_progress=self._on_progress, on_retry=self._on_retry, on_page=self._on_page,
+            on_cached=self._on_cached, cancel=self.cancel_event, **self._fetch_kwargs,
+        ))
+
+    def _fetch_shared(self):
+        while True:
+            try:
+                return self.result_cache.get_or_compute(self.key, self._fetch, on_wait=self._on_wait)
+            except FetchCancelled:
+                if self.cancel_event.is_set():
+                    raise
+                # 기다리던 다른 작업이 취소된 경우: 이 작업이 직접 다시 조회
+                self.waiting = False
+
+    def _run(self):
+        try:
+            self.result = self._fetch() if self.result_cache is None else self._fetch_shared()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+# --- 증분 동기화: untyCntrctNo 단위 로컬 미러 ---
+class ContractMirror:
+    """검색 조건별로 동기화한 계약을 DEDUP_KEY(통합계약번호) 단위로 보관하는 SQLite 미러.
+
+    같은 계약이 다시 오면 등록/변경일시(rgstDt·chgDt 중 늦은 값)가 저장된 것보다 같거나
+    새로울 때만 덮어쓴다. 검색 조건별 동기화 기준일(synced_through)을 함께 기록해 다음
+    동기화는 그 이후만 조회한다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with _prepare_sqlite(path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS contracts ("
+                " contract_no TEXT PRIMARY KEY, stamp TEXT NOT NULL, row TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS contract_queries ("
+                " contract_no TEXT NOT NULL, cntrct_nm TEXT NOT NULL, instt_cd TEXT NOT NULL,"
+                " PRIMARY KEY (contract_no, cntrct_nm, instt_cd))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                " cntrct_nm TEXT NOT NULL, instt_cd TEXT NOT NULL, synced_through TEXT NOT NULL,"
+                " synced_at REAL NOT NULL, PRIMARY KEY (cntrct_nm, instt_cd))"
+            )
+
+    def synced_through(self, query):
+        """query를 마지막으로 동기화한 기준일(date), 없으면 None"""
+        with _sqlite_connection(self.path) as conn:
+            row = conn.execute(
+                "SELECT synced_through FROM sync_state WHERE cntrct_nm = ? AND instt_cd = ?",
+                (query.contract_nm, query.instt_cd),
+            ).fetchone()
+        return datetime.strptime(row[0], "%Y%m%d").date() if row else None
+
+    def mark_synced(self, query, through):
+        with _sqlite_connection(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (cntrct_nm, instt_cd, synced_through, synced_at)"
+                " VALUES (?, ?, ?, ?)",
+                (query.contract_nm, query.instt_cd, through.strftime("%Y%m%d"), time.time()),
+            )
+
+    def upsert(self, query, batch):
+        """batch의 계약을 반영하고 새로 추가/갱신된 건수를 반환 (DEDUP_KEY가 없는 행은 건너뜀)"""
+        records = []
+        for row in batch.rows():
+            contract_no = row.get(DEDUP_KEY)
+            if contract_no:
+                stamp = max(row.get('rgstDt') or '', row.get('chgDt') or '')
+                records.append((contract_no, stamp, json.dumps(row, ensure_ascii=False)))
+        with _sqlite_connection(self.path) as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO contracts (contract_no, stamp, row) VALUES (?, ?, ?)"
+                " ON CONFLICT (contract_no) DO UPDATE SET stamp = excluded.stamp, row = excluded.row"
+                " WHERE excluded.stamp >= contracts.stamp AND excluded.row != contracts.row",
+                records,
+            )
+            changed = conn.total_changes - before
+            conn.executemany(
+                "INSERT OR IGNORE INTO contract_queries (contract_no, cntrct_nm, instt_cd) VALUES (?, ?, ?)",
+                [(contract_no, query.contract_nm, query.instt_cd) for contract_no, _, _ in records],
+            )
+        return changed
+
+    def load(self, queries=None):
+        """미러의 계약을 DataFrame으로 반환 (queries를 주면 그 검색 조건으로 동기화된 계약만)"""
+        with _sqlite_connection(self.path) as conn:
+            if queries:
+                placeholders = " OR ".join("(q.cntrct_nm = ? AND q.instt_cd = ?)" for _ in queries)
+                cursor = conn.execute(
+                    "SELECT DISTINCT c.contract_no, c.row FROM contracts c"
+                    " JOIN contract_queries q ON q.contract_no = c.contract_no"
+                    f" WHERE {placeholders} ORDER BY c.contract_no",
+                    [v for query in queries for v in (query.contract_nm, query.instt_cd)],
+                )
+            else:
+                cursor = conn.execute("SELECT contract_no, row FROM contracts ORDER BY contract_no")
+            rows = [json.loads(row) for _, row in cursor]
+        return _build_frame(ColumnBatch.from_rows(rows))
+
+
+def _stamp_day(value):
+    """'2024-01-02 10:00:00' 같은 등록/변경일시 문자열의 일자 (형식이 다르면 None)"""
+    digits = ''.join(ch for ch in (value or '') if ch.isdigit())[:8]
+    try:
+        return datetime.strptime(digits, "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def _covered_through(start, shards):
+    """start부터 끊김 없이 끝난 구간들의 마지막 일자 (start가 든 구간이 안 끝났으면 None)"""
+    through = None
+    for shard_start, shard_end in sorted(shards):
+        if shard_start > (start if through is None else through + timedelta(days=1)):
+            break
+        through = shard_end if through is None else max(shard_end, through)
+    return through
+
+
+def sync_contracts(queries, mirror, since=None, until=None, client=None, max_workers=FETCH_CONCURRENCY,
+                   on_progress=None, on_retry=None, metrics=None):
+    """queries를 등록/변경일시 기준(SYNC_INQRY_DIV)으로 증분 조회해 mirror에 반영.
+
+    검색 조건마다 지난 동기화 기준일 - SYNC_OVERLAP_DAYS부터 until(기본: 오늘)까지만
+    조회한다. 처음 동기화하는 조건은 since부터 조회하며, since가 없으면 ValueError.
+    기준일은 until이 아니라 실제로 받은 행의 가장 늦은 등록/변경일(rgstDt·chgDt)로 옮기되,
+    조회 시작일부터 끊김 없이 끝난 구간을 넘지 않는다. 받은 행이 없으면 기준일을 옮기지 않고
+    (처음이면 since를 기록), 중간에 실패해도 그때까지 끝난 구간만큼만 반영한다(반영은 멱등).
+    {query: 추가/갱신 건수}를 반환한다.
+    """
+    until = until or date.today()
+    client = client if client is not None else ContractApiClient(pool_size=max_workers)
+
+    tasks = []
+    windows = {}  # query -> (지난 기준일, 조회 시작일)
+    for query in queries:
+        last = mirror.synced_through(query)
+        if last is not None:
+            start = last - timedelta(days=SYNC_OVERLAP_DAYS)
+        elif since is not None:
+            start = since
+        else:
+            raise ValueError(f"처음 동기화하는 검색 조건에는 시작일이 필요합니다: {_query_label(query)}")
+        windows[query] = (last, start)
+        if start <= until:
+            tasks.append((query, (start, until)))
+
+    changed = {query: 0 for query in queries}
+    covered = {query: [] for query in queries}  # 끝난 구간
+    newest = {query: None for query in queries}  # 받은 행의 가장 늦은 등록/변경일
+
+    def _apply(query, shard, batch):
+        changed[query] += mirror.upsert(query, batch)
+        covered[query].append(shard)
+        days = [d for d in map(_stamp_day, batch.column('rgstDt') + batch.column('chgDt')) if d is not None]
+        if newest[query] is not None:
+            days.append(newest[query])
+        if days:
+            newest[query] = max(days)
+
+    try:
+        if tasks:
+            _run_shards(
+                client, tasks, _apply, max_workers=max_workers, inqry_div=SYNC_INQRY_DIV,
+                on_retry=on_retry, on_progress=on_progress, metrics=metrics,
+            )
+    finally:
+        for query in queries:
+            last, start = windows[query]
+            through = _covered_through(start, covered[query])
+            if newest[query] is not None and through is not None:
+                mark = min(newest[query], through, until)
+                if last is None or mark > last:
+                    mirror.mark_synced(query, mark)
+            elif last is None:
+                mirror.mark_synced(query, start)
+    return changed
+
+
+# --- 로컬 계약 보관소: 연/월 단위 Parquet + 조건을 읽기 단계에 적용하는 조회 ---
+def _partition_value(name, field):
+    """'year=2024' 같은 파티션 폴더 이름의 숫자 값 (형식이 다르면 None)"""
+    prefix = f"{field}="
+    value = name[len(prefix):]
+    return int(value) if name.startswith(prefix) and value.isdigit() else None
+
+
+class ContractDataset:
+    """계약을 계약체결일자(INQRY_DATE_FIELD) 연/월별 Parquet 파일로 보관하는 로컬 저장소.
+
+    같은 DEDUP_KEY의 계약은 나중에 쓴 행으로 바꾼다. 텍스트는 category가 아닌 일반 문자열,
+    금액은 int64, 일자는 timestamp로 모든 파일이 같은 스키마(STORE_COLUMNS)를 쓴다. 조회는
+    pyarrow.dataset으로 기간에 해당하는 월 파일만 열고, 필요한 컬럼과 행 조건을 읽는 단계에서
+    적용하므로 보관한 전체 양보다 적은 메모리로 동작한다. pyarrow가 필요하다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def _schema():
+        import pyarrow as pa
+        return pa.schema([
+            (c, pa.int64() if c in AMOUNT_COLS else pa.timestamp('ns') if c in DATE_COLS else pa.string())
+            for c in STORE_COLUMNS
+        ])
+
+    def _partition_path(self, year, month):
+        return os.path.join(self.path, f"year={year:04d}", f"month={month:02d}", "part.parquet")
+
+    def _partitions(self):
+        """보관소의 [(연, 월, 파일 경로), ...]. year=YYYY/month=MM 형식이 아닌 항목(.DS_Store 등)은 건너뜀"""
+        found = []
+        if not os.path.isdir(self.path):
+            return found
+        for year_dir in sorted(os.listdir(self.path)):
+            year = _partition_value(year_dir, 'year')
+            year_path = os.path.join(self.path, year_dir)
+            if year is None or not os.path.isdir(year_path):
+                continue
+            for month_dir in sorted(os.listdir(year_path)):
+                month = _partition_value(month_dir, 'month')
+                path = os.path.join(year_path, month_dir, "part.parquet")
+                if month is not None and os.path.isfile(path):
+                    found.append((year, month, path))
+        return found
+
+    def _partition_files(self, start=None, end=None):
+        """start~end(포함)에 걸치는 월 파일 경로 목록 (기간이 없으면 전체, 일자 없는 계약은 기간 조회에서 제외)"""
+        first = (start.year, start.month) if start else None
+        last = (end.year, end.month) if end else None
+        return [
+            path for year, month, path in self._partitions()
+            if not ((first or last) and year == 0)
+            and not (first and (year, month) < first) and not (last and (year, month) > last)
+        ]
+
+    @staticmethod
+    def _replace_file(path, table):
+        """path를 table로 교체 (임시 파일에 쓴 뒤 교체, 빈 table이면 파일 삭제)"""
+        import pyarrow.parquet as pq
+        if table.num_rows == 0:
+            _remove_file(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _drop_keys(self, keys, skip=()):
+        """skip(경로 목록) 밖의 월 파일에서 DEDUP_KEY가 keys에 든 행을 지움 (키 컬럼만 읽어 확인)"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        value_set = pa.array(sorted(keys), type=pa.string())
+        for _, _, path in self._partitions():
+            if path in skip:
+                continue
+            found = pc.is_in(pq.read_table(path, columns=[DEDUP_KEY]).column(0), value_set=value_set)
+            if pc.any(found).as_py():
+                table = pq.read_table(path, schema=self._schema())
+                self._replace_file(path, table.filter(pc.invert(pc.fill_null(found, False))))
+
+    def _to_table(self, df):
+        """df를 보관소 스키마의 pyarrow Table로 (없는 컬럼은 빈 값, category는 문자열로)"""
+        import pyarrow as pa
+        data = {}
+        for c in STORE_COLUMNS:
+            if c not in df.columns:
+                data[c] = [None] * len(df)
+            elif c in AMOUNT_COLS or c in DATE_COLS:
+                data[c] = df[c]
+            else:
+                data[c] = df[c].astype(object).where(df[c].notna(), None)
+        return pa.Table.from_pandas(pd.DataFrame(data), schema=self._schema(), preserve_index=False)
+
+    def write(self, df):
+        """df(조회 결과)를 월 파일에 반영하고 반영한 행 수를 반환. 파일은 임시 파일에 쓴 뒤 교체.
+
+        같은 계약이 다른 월 파일에 있으면(계약체결일자가 바뀌었거나 나중에 채워진 경우) 그 행은 지운다.
+        """
+        import pyarrow.parquet as pq
+        if df.empty:
+            return 0
+        if DEDUP_KEY in df.columns:
+            keys = df[DEDUP_KEY]
+            df = df[keys.isna() | ~keys.duplicated(keep='last')]
+        dates = pd.to_datetime(df[INQRY_DATE_FIELD], errors='coerce') if INQRY_DATE_FIELD in df.columns \
+            else pd.Series(pd.NaT, index=df.index)
+        year = dates.dt.year.fillna(0).astype(int)
+        month = dates.dt.month.fillna(0).astype(int)
+        groups = list(df.groupby([year, month], sort=True))
+        paths = {self._partition_path(y, m) for (y, m), _ in groups}
+        if DEDUP_KEY in df.columns:
+            self._drop_keys({str(k) for k in df[DEDUP_KEY].dropna()}, skip=paths)
+        for (y, m), rows in groups:
+            path = self._partition_path(y, m)
+            table = self._to_table(rows)
+            if os.path.exists(path):
+                merged = pd.concat([pq.read_table(path).to_pandas(), table.to_pandas()], ignore_index=True)
+                keys = merged[DEDUP_KEY]
+                # 키가 있는 행은 마지막(새로 쓴) 행만 남김
+                merged = merged[keys.isna() | ~keys.duplicated(keep='last')]
+                table = self._to_table(merged)
+            self._replace_file(path, table)
+        return len(df)
+
+    def query(self, columns=None, start=None, end=None, keywords=None, keyword_column='cntrctNm',
+              institution=None, jurisdictions=None, min_amount=None, max_amount=None,
+              amount_column='totCntrctAmt'):
+        """조건에 맞는 계약을 DataFrame으로 반환 (금액: Int64, 일자: datetime64, _build_frame과 같은 형태).
+
+        columns: 읽을 컬럼 (기본: 전체), start/end: 계약체결일자 기간(포함),
+        keywords: keyword_column에 하나라도 포함(대소문자 무시), institution: 계약기관명에 포함,
+        jurisdictions: 계약기관소관구분명 목록(INSTITUTION_TYPES 이름), min/max_amount: amount_column 범위.
+        """
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        schema = self._schema()
+        columns = list(columns) if columns else list(STORE_COLUMNS)
+        files = self._partition_files(start, end)
+        if not files:
+            return _build_frame(ColumnBatch({c: [] for c in columns}, 0))
+
+        conditions = []
+        if start:
+            conditions.append(ds.field(INQRY_DATE_FIELD) >= datetime.combine(start, datetime.min.time()))
+        if end:
+            conditions.append(ds.field(INQRY_DATE_FIELD) < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        if keywords:
+            matches = [pc.match_substring(ds.field(keyword_column), k, ignore_case=True) for k in keywords]
+            conditions.append(_any_expression(matches))
+        if institution:
+            conditions.append(pc.match_substring(ds.field('cntrctInsttNm'), institution, ignore_case=True))
+        if jurisdictions:
+            conditions.append(ds.field('cntrctInsttJrsdctnDivNm').isin(list(jurisdictions)))
+        if min_amount is not None:
+            conditions.append(ds.field(amount_column) >= min_amount)
+        if max_amount is not None:
+            conditions.append(ds.field(amount_column) <= max_amount)
+
+        dataset = ds.dataset(files, schema=schema, format='parquet')
+        table = dataset.to_table(columns=columns, filter=_all_expression(conditions))
+        df = table.to_pandas()
+        for c in columns:
+            if c in AMOUNT_COLS:
+                df[c] = df[c].astype('Int64')
+        return df
+
+
+def _all_expression(conditions):
+    """조건식들을 AND로 (없으면 None = 조건 없음)"""
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _any_expression(conditions):
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression | condition
+    return expression
+
+
+def ingest_contracts(df):
+    """조회 결과를 세션에 보관할 형태로 한 번만 정리.
+
+    금액(Int64)·일자(datetime64)는 _build_frame에서 이미 변환되어 있고, 여기서는 반복되는
+    텍스트 컬럼을 category로 바꿔 메모리를 줄인다. 이후 필터/다운로드/화면 표시는 이 프레임을
+    그대로 사용하며 다시 변환하지 않는다.
+    """
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def build_display_frame(df):
+    """df의 화면 표시용 프레임: 표시 컬럼만 한글명으로, 일자는 날짜 문자열로, 맨 앞에 순번"""
+    display_df = df[[c for c in DISPLAY_COLUMN_MAP if c in df.columns]].rename(columns=DISPLAY_COLUMN_MAP)
+    for col in display_df.columns:
+        if pd.api.types.is_datetime64_any_dtype(display_df[col]):
+            display_df[col] = display_df[col].dt.strftime('%Y-%m-%d')
+    display_df.insert(0, '순번', range(1, len(display_df) + 1))
+    return display_df
+
+# --- 내보내기 파일 생성 ---
+def _append_sheet(wb, df, title=None):
+    ws = wb.create_sheet(title)
+    ws.append(list(df.columns))
+    # 컬럼 단위로 결측값을 None으로 바꾼 뒤 행으로 묶음
+    columns = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns]
+    for row in zip(*columns):
+        ws.append(row)
+
+
+def _write_xlsx(df, out):
+    """openpyxl write-only 모드로 행을 순서대로 흘려 쓰는 XLSX 생성 (셀 객체를 메모리에 쌓지 않음)"""
+    wb = Workbook(write_only=True)
+    _append_sheet(wb, df)
+    wb.save(out)
+
+
+def write_export(df, fmt, out):
+    """df를 다운로드용 한글 컬럼명으로 바꿔 fmt(EXPORT_FORMATS 키) 형식으로 바이너리 파일 객체 out에 씀"""
+    df = df.rename(columns=DOWNLOAD_COLUMN_MAP)
+    if fmt == 'CSV':
+        # 엑셀에서 한글이 깨지지 않도록 BOM 포함, 청크 단위로 흘려 씀
+        text = io.TextIOWrapper(out, encoding='utf-8-sig', newline='')
+        df.to_csv(text, index=False, chunksize=CSV_CHUNK_ROWS)
+        text.detach()
+    elif fmt == 'XLSX':
+        _write_xlsx(df, out)
+    elif fmt == 'Parquet':
+        df.to_parquet(out, index=False)
+    else:
+        raise ValueError(f"지원하지 않는 형식: {fmt}")
+
+
+def build_export(df, fmt):
+    """write_export 결과를 bytes로 반환 (다운로드 버튼용)"""
+    buf = io.BytesIO()
+    write_export(df, fmt, buf)
+    return buf.getvalue()
+
+
+# --- 키워드 필터 색인 ---
+def _normalize_text(text):
+    """필터 비교용 정규화: NFKC(전각/반각 통일) 후 소문자"""
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def _ngrams(text):
+    """색인에 넣을 문자 1-gram과 2-gram (한국어는 단어 중간 검색이 많아 토큰 대신 n-gram 사용)"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _index_texts(uniques):
+    if pd.api.types.is_datetime64_any_dtype(uniques):
+        return uniques.strftime('%Y-%m-%d')
+    return [str(v) for v in uniques]
+
+
+class KeywordIndex:
+    """한 컬럼의 부분 문자열 검색용 n-gram 역색인.
+
+    값은 고유값 단위로 한 번만 정규화·색인한다. 검색은 키워드의 2-gram(한 글자면
+    1-gram) 게시 목록을 교집합해 고유값 후보를 좁히고, 후보에 키워드가 실제로 들어
+    있는지 확인한 뒤 일치한 고유값을 가진 행의 불리언 마스크를 돌려준다.
+    """
+
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series)
+        self.codes = codes  # 결측값은 -1
+        self.values = [_normalize_text(t) for t in _index_texts(uniques)]
+        self._ids = {value: i for i, value in enumerate(self.values)}
+        postings = {}
+        for i, text in enumerate(self.values):
+            for gram in _ngrams(text):
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def extend(self, series):
+        """기존 행 뒤에 붙은 행들(series)을 색인에 추가. 이미 있는 값은 그 고유값을 그대로 쓰고 새 값만 색인한다."""
+        codes, uniques = pd.factorize(series)
+        mapped = np.empty(len(uniques), dtype=np.intp)
+        postings = {}
+        for j, value in enumerate(_normalize_text(t) for t in _index_texts(uniques)):
+            i = self._ids.get(value)
+            if i is None:
+                i = self._ids[value] = len(self.values)
+                self.values.append(value)
+                for gram in _ngrams(value):
+                    postings.setdefault(gram, []).append(i)
+            mapped[j] = i
+        # 새 고유값 번호는 기존보다 크므로 이어 붙여도 게시 목록은 정렬·중복 없음 상태로 유지됨
+        for gram, ids in postings.items():
+            ids = np.array(ids, dtype=np.int32)
+            old = self.postings.get(gram)
+            self.postings[gram] = ids if old is None else np.concatenate([old, ids])
+        new_codes = np.full(len(codes), -1, dtype=np.intp)
+        valid = codes >= 0
+        new_codes[valid] = mapped[codes[valid]]
+        self.codes = np.concatenate([self.codes, new_codes])
+
+    def search(self, keyword):
+        keyword = _normalize_text(keyword)
+        if not keyword:
+            return np.ones(len(self.codes), dtype=bool)
+        grams = [keyword] if len(keyword) == 1 else {keyword[i:i + 2] for i in range(len(keyword) - 1)}
+        candidates = None
+        for gram in sorted(grams, key=lambda g: len(self.postings.get(g, ()))):
+            ids = self.postings.get(gram)
+            if ids is None:
+                return np.zeros(len(self.codes), dtype=bool)
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+        matched = [i for i in candidates if keyword in self.values[i]]
+        return np.isin(self.codes, matched)
+
+    @property
+    def nbytes(self):
+        """색인이 차지하는 대략적인 메모리 (세션 메모리 상한 계산용)"""
+        postings = sum(ids.nbytes + 64 for ids in self.postings.values())
+        values = sum(len(v) * 2 + 50 for v in self.values)
+        return self.codes.nbytes + postings + values
+
+
+def filter_rows(df, conditions, indexes):
+    """conditions({API 컬럼: 키워드})를 모두 만족(AND)하는 행 위치 배열. 조건이 없으면 None(전체).
+
+    indexes는 컬럼별 KeywordIndex 보관용 dict로, 처음 쓰는 컬럼만 색인을 만든다.
+    """
+    mask = None
+    for col, keyword in conditions.items():
+        if col not in df.columns:
+            continue
+        if col not in indexes:
+            indexes[col] = KeywordIndex(df[col])
+        col_mask = indexes[col].search(keyword)
+        mask = col_mask if mask is None else mask & col_mask
+    return None if mask is None else np.flatnonzero(mask)
+
+
+# --- 집계 요약: 기관/월/분류/업체별 건수와 금액 합계 ---
+def explode_list(series, fields):
+    """"[a^b^c],[a^b^c]" 형식 목록 컬럼을 (row: 행 위치, fields 이름별 값) 긴 표로 펼침.
+
+    같은 문자열은 한 번만 파싱하고(고유값 단위), 항목마다 fields({이름: 위치}) 필드를 꺼낸다.
+    값이 없거나 항목이 없는 행은 결과에 나오지 않는다.
+    """
+    codes, uniques = pd.factorize(series)
+    items = pd.Series(np.asarray(uniques, dtype=object)).str.findall(r'\[([^\[\]]*)\]').explode().dropna()
+    parts = items.str.split('^', expand=True) if len(items) else pd.DataFrame(index=items.index)
+    table = pd.DataFrame(
+        {name: parts[pos].str.strip() if pos in parts.columns else None for name, pos in fields.items()},
+        index=items.index,
+    )
+    rows = pd.DataFrame({'row': np.arange(len(codes)), 'uid': codes})
+    rows = rows[rows['uid'] >= 0]
+    return rows.merge(table, left_on='uid', right_index=True).drop(columns='uid').reset_index(drop=True)
+
+
+def contract_lookup_tables(df):
+    """corpList/dminsttList를 한 번 펼친 조회용 표 {'corps': ..., 'dminstts': ...} (데이터셋마다 한 번 만들어 재사용)"""
+    tables = {}
+    for name, col, fields in (('corps', 'corpList', CORP_FIELDS), ('dminstts', 'dminsttList', DMINSTT_FIELDS)):
+        series = df[col] if col in df.columns else pd.Series([None] * len(df), dtype=object)
+        tables[name] = explode_list(series, fields)
+    return tables
+
+
+def _group_totals(keys, amounts, key_label, sort_by_key=False):
+    """keys별 건수와 금액 컬럼 합계. 기본은 총계약금액 합계 내림차순"""
+    keys = pd.Series(keys, dtype=object).fillna(SUMMARY_MISSING).replace('', SUMMARY_MISSING)
+    data = pd.DataFrame({key_label: keys.to_numpy()})
+    for col, values in amounts.items():
+        data[f"{DOWNLOAD_COLUMN_MAP[col]} 합계"] = pd.array(values, dtype='Int64')
+    grouped = data.groupby(key_label, sort=False)
+    result = grouped.sum()
+    result.insert(0, '건수', grouped.size())
+    if sort_by_key:
+        result = result.sort_index()
+    else:
+        result = result.sort_values(list(result.columns[1:2]) or ['건수'], ascending=False, kind='stable')
+    return result.reset_index()
+
+
+def summarize_contracts(df, rows=None, tables=None, top_n=SUMMARY_TOP_N):
+    """df(rows가 있으면 그 행 위치만)의 요약 표 {요약 이름: DataFrame} (SUMMARY_LABELS 순서).
+
+    tables는 contract_lookup_tables(df) 결과로, 데이터셋마다 한 번 만들어 넘기면 다시 파싱하지 않는다.
+    업체별 요약은 계약 건수, 총계약금액 합계, 지분율을 반영한 금액을 보이고 상위 top_n개만 남긴다.
+    """
+    tables = tables if tables is not None else contract_lookup_tables(df)
+    view = df if rows is None else df.iloc[rows]
+    amount_cols = [c for c in DOWNLOAD_AMOUNT_ORIGINAL_COLS if c in df.columns]
+    amounts = {c: view[c] for c in amount_cols}
+
+    def _column(col):
+        return view[col] if col in view.columns else pd.Series([None] * len(view), dtype=object)
+
+    summaries = {}
+    summaries['institution'] = _group_totals(_column('cntrctInsttNm'), amounts, SUMMARY_LABELS['institution'][1])
+    dates = _column(INQRY_DATE_FIELD)
+    months = dates.dt.strftime('%Y-%m') if pd.api.types.is_datetime64_any_dtype(dates) else dates
+    summaries['month'] = _group_totals(months, amounts, SUMMARY_LABELS['month'][1], sort_by_key=True)
+    summaries['category'] = _group_totals(_column('pubPrcrmntClsfcNm'), amounts, SUMMARY_LABELS['category'][1])
+
+    # 목록 컬럼 요약: 펼친 표의 행 위치로 금액을 가져옴 (한 계약의 금액은 업체/수요기관마다 전액 집계)
+    total_amounts = df['totCntrctAmt'].to_numpy(dtype='float64', na_value=np.nan) if 'totCntrctAmt' in df.columns \
+        else np.full(len(df), np.nan)
+    for name, table_name, key_col in (('vendor', 'corps', 'corpNm'), ('demand', 'dminstts', 'dminsttNm')):
+        table = tables[table_name]
+        if rows is not None:
+            table = table[np.isin(table['row'].to_numpy(), rows)]
+        table_amounts = {c: df[c].to_numpy()[table['row'].to_numpy()] for c in amount_cols}
+        summary = _group_totals(table[key_col], table_amounts, SUMMARY_LABELS[name][1])
+        if name == 'vendor':
+            share = pd.to_numeric(table['shareRate'], errors='coerce').fillna(100).to_numpy() / 100
+            weighted = pd.Series(total_amounts[table['row'].to_numpy()] * share).groupby(
+                pd.Series(table[key_col], dtype=object).fillna(SUMMARY_MISSING).replace('', SUMMARY_MISSING).to_numpy()
+            ).sum(min_count=1)
+            summary['지분 반영 총계약금액'] = summary[SUMMARY_LABELS[name][1]].map(weighted).round().astype('Int64')
+            summary = summary.head(top_n)
+        summaries[name] = summary
+    return summaries
+
+
+def write_summary_xlsx(summaries, out):
+    """summarize_contracts 결과를 요약마다 시트 하나씩인 XLSX로 out에 씀"""
+    wb = Workbook(write_only=True)
+    for name, table in summaries.items():
+        _append_sheet(wb, table, SUMMARY_LABELS[name][0])
+    wb.save(out)
+
+
+def build_summary_export(summaries):
+    """write_summary_xlsx 결과를 bytes로 반환 (다운로드 버튼용)"""
+    buf = io.BytesIO()
+    write_summary_xlsx(summaries, buf)
+    return buf.getvalue()
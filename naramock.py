@@ -0,0 +1,236 @@
+# naramock.py
+# 계약정보 API(getCntrctInfoListServcPPSSrch)를 흉내 내는 로컬 테스트 서버 (벤치마크/개발용, 실제 API 호출 없음)
+#
+# 예) python naramock.py --rows-per-year 100000 --latency 0.05 --error-rate 0.02
+#     NARA_API_URL=http://127.0.0.1:8765/ NARA_SERVICE_KEY=dummy streamlit run naraweb.py
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+from naracore import MAX_API_ROWS
+
+MOCK_PORT = 8765
+
+
+class MockSettings:
+    """합성 응답 설정.
+
+    rows_per_year: 365일 동안 고르게 나눠 생성할 계약 수 (조회 기간에 비례해 totalCount가 정해짐)
+    max_rows: 한 페이지 최대 행 수 (numOfRows가 더 커도 이 값으로 제한)
+    latency / jitter: 응답마다 기다리는 시간(초)과 그 위에 더하는 무작위 지연 상한
+    error_rate: 429/500/503 응답 비율, timeout_rate: hang초 동안 응답하지 않는 비율
+    api_error_rate: resultCode가 '00'이 아닌 정상(200) 응답 비율 (오류/지연은 요청마다 따로 뽑음)
+    """
+
+    def __init__(self, rows_per_year=10000, max_rows=MAX_API_ROWS, latency=0.0, jitter=0.0,
+                 error_rate=0.0, timeout_rate=0.0, hang=5.0, api_error_rate=0.0, seed=None):
+        self.rows_per_year = rows_per_year
+        self.max_rows = max_rows
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.api_error_rate = api_error_rate
+        self.random = random.Random(seed)
+
+
+def _parse_ymd(text):
+    return date(int(text[:4]), int(text[4:6]), int(text[6:8]))
+
+
+def _rows_on(day, rows_per_year):
+    """day에 생성되는 계약 수 (날짜 서수 기준으로 나눠 어느 기간을 조회해도 합이 일정)"""
+    n = day.toordinal()
+    return rows_per_year * (n + 1) // 365 - rows_per_year * n // 365
+
+
+def _page_keys(bgn, end, rows_per_year, offset, limit):
+    """bgn~end 기간 계약 중 offset부터 limit개의 (일자, 일자 내 순번)과 전체 건수"""
+    keys = []
+    total = 0
+    day = bgn
+    while day <= end:
+        count = _rows_on(day, rows_per_year)
+        lo = max(offset - total, 0)
+        hi = min(offset + limit - total, count)
+        keys.extend((day, i) for i in range(lo, hi))
+        total += count
+        day += timedelta(days=1)
+    return keys, total
+
+
+def _item_xml(day, i, contract_nm):
+    """(일자, 순번)에서 항상 같은 값이 나오는 계약 한 건"""
+    no = f"R{day:%y%m%d}{i:05d}"
+    kind = i % 4
+    amount = 1000 * (i % 997) + 7 * day.day
+    fields = {
+        'untyCntrctNo': no,
+        'bsnsDivNm': '용역',
+        'dcsnCntrctNo': f"{no}00",
+        'cntrctRefNo': f"{no}-1",
+        'cntrctNm': f"{contract_nm} 구축 용역 {i}",
+        'cmmnCntrctYn': 'N' if i % 5 else 'Y',
+        'lngtrmCtnuDivNm': '장기' if i % 6 == 0 else '',
+        'cntrctCnclsDate': f"{day:%Y-%m-%d}",
+        'cntrctPrd': f"착수일로부터 {30 + i % 300}일",
+        'baseLawNm': '국가를 당사자로 하는 계약에 관한 법률',
+        'totCntrctAmt': str(amount),
+        'thtmCntrctAmt': str(amount // 2),
+        'cntrctInsttCd': f"{1000000 + i % 50}",
+        'cntrctInsttNm': f"기관{i % 50}",
+        'cntrctInsttJrsdctnDivNm': ('국가기관', '지방자치단체', '교육기관', '공기업')[kind],
+        'cntrctInsttChrgDeptNm': f"정보화과{i % 3}",
+        'cntrctInsttOfclNm': '홍길동',
+        'dminsttList': f"[1^{2000000 + i % 80}^수요기관{i % 80}]",
+        'corpList': f"[1^주계약업체^단독^업체{i % 120}^대표{i % 7}^대한민국^{1234500000 + i % 120}^100]",
+        'cntrctCnclsMthdNm': ('수의계약', '제한경쟁', '일반경쟁', '협상에 의한 계약')[kind],
+        'rgstDt': f"{day:%Y-%m-%d} 10:{i % 60:02d}:00",
+        'chgDt': '',
+        'wbgnDate': f"{day:%Y-%m-%d}",
+        'thtmScmpltDate': f"{day + timedelta(days=30 + i % 300):%Y-%m-%d}",
+        'ttalScmpltDate': f"{day + timedelta(days=30 + i % 300):%Y-%m-%d}",
+        'pubPrcrmntClsfcNo': f"{81110000 + kind}",
+        'pubPrcrmntClsfcNm': ('정보시스템개발서비스', '유지관리', '영상감시', '데이터구축')[kind],
+        'cntrctDate': f"{day:%Y-%m-%d}",
+        'infoBizYn': 'Y' if kind < 2 else 'N',
+    }
+    return "<item>" + "".join(f"<{k}>{escape(v)}</{k}>" for k, v in fields.items()) + "</item>"
+
+
+def render_page(settings, params):
+    """요청 파라미터로 응답 XML(bytes)을 만든다"""
+    bgn = _parse_ymd(params['inqryBgnDate'])
+    end = _parse_ymd(params['inqryEndDate'])
+    num_rows = min(int(params.get('numOfRows', 10)), settings.max_rows)
+    page_no = int(params.get('pageNo', 1))
+    keys, total = _page_keys(bgn, end, settings.rows_per_year, (page_no - 1) * num_rows, num_rows)
+    contract_nm = params.get('cntrctNm', '')
+    items = "".join(_item_xml(day, i, contract_nm) for day, i in keys)
+    return (
+        "<response><header><resultCode>00</resultCode><resultMsg>NORMAL SERVICE.</resultMsg></header>"
+        f"<body><items>{items}</items><numOfRows>{num_rows}</numOfRows><pageNo>{page_no}</pageNo>"
+        f"<totalCount>{total}</totalCount></body></response>"
+    ).encode('utf-8')
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    settings = MockSettings()
+    stats = None  # {'requests', 'errors', 'timeouts', 'api_errors', 'bytes'}
+    stats_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def _send(self, status, body, content_type='application/xml', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            with self.stats_lock:
+                body = json.dumps(self.stats).encode('utf-8')
+            self._send(200, body, 'application/json')
+            return
+
+        settings = self.settings
+        self._count('requests')
+        roll = settings.random.random()
+        delay = settings.latency + settings.random.uniform(0, settings.jitter)
+        if roll < settings.timeout_rate:
+            self._count('timeouts')
+            time.sleep(settings.hang)
+        elif roll < settings.timeout_rate + settings.error_rate:
+            self._count('errors')
+            time.sleep(delay)
+            status = settings.random.choice((429, 500, 503))
+            self._send(status, b'', headers={'Retry-After': '1'} if status == 429 else None)
+            return
+        elif roll < settings.timeout_rate + settings.error_rate + settings.api_error_rate:
+            self._count('api_errors')
+            time.sleep(delay)
+            self._send(200, "<response><header><resultCode>22</resultCode>"
+                            "<resultMsg>LIMITED NUMBER OF SERVICE REQUESTS EXCEEDS ERROR.</resultMsg>"
+                            "</header></response>".encode('utf-8'))
+            return
+        else:
+            time.sleep(delay)
+
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            body = render_page(settings, params)
+        except (KeyError, ValueError):
+            self._send(400, b'bad request')
+            return
+        self._count('bytes', len(body))
+        try:
+            self._send(200, body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 클라이언트가 타임아웃으로 먼저 끊은 경우
+
+
+def start_mock_server(settings, host='127.0.0.1', port=0):
+    """settings로 응답하는 서버를 백그라운드 스레드에서 시작하고 (server, api_url)을 반환.
+
+    port=0이면 빈 포트를 쓴다. 끝나면 server.shutdown()을 호출한다.
+    """
+    handler = type('BoundMockHandler', (MockHandler,), {
+        'settings': settings,
+        'stats': {'requests': 0, 'errors': 0, 'timeouts': 0, 'api_errors': 0, 'bytes': 0},
+        'stats_lock': threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="계약정보 API 로컬 테스트 서버")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=MOCK_PORT)
+    parser.add_argument("--rows-per-year", type=int, default=10000, help="1년(365일)당 생성할 계약 수")
+    parser.add_argument("--max-rows", type=int, default=MAX_API_ROWS, help="한 페이지 최대 행 수")
+    parser.add_argument("--latency", type=float, default=0.0, help="응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="응답 지연에 더할 무작위 지연 상한(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429/500/503 응답 비율 (0~1)")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="응답하지 않는 요청 비율 (0~1)")
+    parser.add_argument("--hang", type=float, default=5.0, help="응답하지 않는 요청의 대기 시간(초)")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="resultCode 오류 응답 비율 (0~1)")
+    parser.add_argument("--seed", type=int, help="오류/지연 난수 시드")
+    args = parser.parse_args(argv)
+
+    settings = MockSettings(
+        rows_per_year=args.rows_per_year, max_rows=args.max_rows, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, timeout_rate=args.timeout_rate, hang=args.hang,
+        api_error_rate=args.api_error_rate, seed=args.seed,
+    )
+    server, api_url = start_mock_server(settings, args.host, args.port)
+    print(f"모의 API 실행 중: {api_url} (통계: {api_url}stats, 종료: Ctrl+C)", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,123 +1,83 @@
 # naraweb.py
 import os
-import io
-import time
-import requests
-import xml.etree.ElementTree as ET
+import threading
+import weakref
 import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
 
-# --- 환경 로드 (.env 사용 시) ---
-load_dotenv()  # 로컬에서 .env 파일을 사용하는 경우에 유용
+from naracore import (
+    CACHE_DB_PATH,
+    DATASET_DIR,
+    DISPLAY_COLUMN_MAP,
+    DOWNLOAD_AMOUNT_ORIGINAL_COLS,
+    EXPORT_FORMATS,
+    FETCH_CONCURRENCY,
+    INSTITUTION_TYPES,
+    METRICS_LOG_PATH,
+    SERVICE_KEY,
+    SESSION_MEMORY_BUDGET,
+    SHARED_FETCH_JOBS,
+    SUMMARY_LABELS,
+    ContractApiClient,
+    ContractDataset,
+    ContractDayCache,
+    ContractQuery,
+    FetchJob,
+    FrameSpiller,
+    Metrics,
+    ResultCache,
+    SpillableFrame,
+    build_display_frame,
+    build_export,
+    build_summary_export,
+    describe_fetch_error,
+    contract_lookup_tables,
+    filter_rows,
+    ingest_contracts,
+    summarize_contracts,
+)
 
 # 디버그 모드 설정: Streamlit Cloud/Actions에 NARA_DEBUG=true/false로 설정 가능
 DEBUG = os.getenv("NARA_DEBUG", "false").lower() in ("1", "true", "yes")
 
-# --- 서비스 키 (환경변수에서 읽기) ---
-SERVICE_KEY = os.getenv("NARA_SERVICE_KEY")
+# --- 서비스 키 (환경변수에서 읽기, naracore에서 .env도 로드) ---
 if not SERVICE_KEY:
-    import streamlit as st
     st.warning("환경변수 NARA_SERVICE_KEY가 설정되어 있지 않습니다. GitHub Secrets에 추가하세요.")
-API_URL = 'http://apis.data.go.kr/1230000/ao/CntrctInfoService/getCntrctInfoListServcPPSSrch'
-MAX_API_ROWS = 999  # API가 한 번에 반환하는 최대 개수
 
 # --- 화면 표시용 컬럼 매핑 (반드시 UI 초기화보다 먼저 정의) ---
-display_columns_map = {
-    'untyCntrctNo': '통합계약번호',
-    'bsnsDivNm': '업무구분명',
-    'cntrctNm': '계약명',
-    'cntrctCnclsDate': '계약체결일자',
-    'totCntrctAmt': '총계약금액',
-    'thtmCntrctAmt': '금차계약금액',
-    'cntrctInsttNm': '계약기관명',
-    'dminsttList': '수요기관목록',
-    'corpList': '업체목록',
-    'wbgnDate': '착수일자',
-    'ttalScmpltDate': '총완수일자',
-}
+display_columns_map = DISPLAY_COLUMN_MAP
 display_column_names = list(display_columns_map.values())
 reverse_display_columns_map = {v: k for k, v in display_columns_map.items()}
 
-# --- 다운로드용 컬럼 한글 매핑 (필요하면 확장) ---
-DOWNLOAD_COLUMN_MAP = {
-    'resultCode': '결과코드',
-    'resultMsg': '결과메세지',
-    'numOfRows': '한 페이지 결과 수',
-    'pageNo': '페이지 번호',
-    'totalCount': '전체 결과 수',
-    'untyCntrctNo': '통합계약번호',
-    'bsnsDivNm': '업무구분명',
-    'dcsnCntrctNo': '확정계약번호',
-    'cntrctRefNo': '계약참조번호',
-    'cntrctNm': '계약명',
-    'cmmnCntrctYn': '공동계약여부',
-    'lngtrmCtnuDivNm': '장기계속구분명',
-    'cntrctCnclsDate': '계약체결일자',
-    'cntrctPrd': '계약기간',
-    'baseLawNm': '근거법률명',
-    'totCntrctAmt': '총계약금액',
-    'thtmCntrctAmt': '금차계약금액',
-    'grntymnyRate': '보증금률',
-    'cntrctInfoUrl': '계약정보URL',
-    'payDivNm': '지급구분명',
-    'reqNo': '요청번호',
-    'ntceNo': '공고번호',
-    'cntrctInsttCd': '계약기관코드',
-    'cntrctInsttNm': '계약기관명',
-    'cntrctInsttJrsdctnDivNm': '계약기관소관구분명',
-    'cntrctInsttChrgDeptNm': '계약기관담당부서명',
-    'cntrctInsttOfclNm': '계약기관담당자명',
-    'cntrctInsttOfclTelNo': '계약기관담당자전화번호',
-    'cntrctInsttOfclFaxNo': '계약기관담당자팩스번호',
-    'dminsttList': '수요기관목록',
-    'corpList': '업체목록',
-    'cntrctDtlInfoUrl': '계약상세정보URL',
-    'crdtrNm': '채권자명',
-    'baseDtls': '근거내역',
-    'cntrctCnclsMthdNm': '계약체결방법명',
-    'rgstDt': '등록일시',
-    'chgDt': '변경일시',
-    'dfrcmpnstRt': '지체상금율',
-    'wbgnDate': '착수일자',
-    'thtmScmpltDate': '금차완수일자',
-    'ttalScmpltDate': '총완수일자',
-    'pubPrcrmntLrgclsfcNm ': '공공조달대분류명',
-    'pubPrcrmntMidclsfcNm': '공공조달중분류명',
-    'pubPrcrmntClsfcNo': '공공조달분류번호',
-    'pubPrcrmntClsfcNm': '공공조달분류명',
-    'cntrctDate': '계약일자',
-    'infoBizYn': '정보화사업여부'
-}
-DOWNLOAD_AMOUNT_ORIGINAL_COLS = ['totCntrctAmt', 'thtmCntrctAmt']
-
-# --- 소관기관 코드 매핑 (첨부된 매핑 사용) ---
-INSTITUTION_TYPES = {
-    "국가기관": "01",
-    "지방자치단체": "02",
-    "교육기관": "03",
-    "정부투자기관": "05",
-    "임의기관": "07",
-    "공기업": "51",
-    "준정부기관": "52",
-    "기타공공기관": "53",
-    "지방공기업": "71",
-    "기타기관": "72",
-}
-
 # --- Streamlit 페이지 설정 ---
 st.set_page_config(page_title="나라장터 계약 내역 조회", layout="wide")
 st.title("🏛️ 나라장터 용역 계약 내역 조회")
 
 # --- Session state 초기화 (변수 정의 이후) ---
-if 'data_df' not in st.session_state:
-    st.session_state.data_df = pd.DataFrame()
-if 'filtered_data_df' not in st.session_state:
-    st.session_state.filtered_data_df = pd.DataFrame()
-if 'current_page' not in st.session_state:
-    st.session_state.current_page = 1
+if 'dataset' not in st.session_state:
+    st.session_state.dataset = None  # 조회 결과 (SpillableFrame, 다른 세션과 공유할 수 있으므로 수정하지 않음)
+if 'filtered_rows' not in st.session_state:
+    st.session_state.filtered_rows = None  # 필터 결과 행 위치 (None = 전체)
+if 'filter_conditions' not in st.session_state:
+    st.session_state.filter_conditions = {}  # {API 컬럼: 키워드}, 모두 만족(AND)
+if 'filter_indexes' not in st.session_state:
+    st.session_state.filter_indexes = {}  # 현재 데이터셋의 컬럼별 KeywordIndex
+if 'data_version' not in st.session_state:
+    st.session_state.data_version = 0  # 새 검색 결과마다 증가 (내보내기 파일 등 데이터셋별 캐시 키)
+if 'exports' not in st.session_state:
+    st.session_state.exports = {}
+if 'grid_options' not in st.session_state:
+    st.session_state.grid_options = {}  # {(data_version, 페이지 크기): AgGrid 옵션}
+if 'fetch_job' not in st.session_state:
+    st.session_state.fetch_job = None  # 진행 중인 백그라운드 조회 작업 (FetchJob)
+if 'fetch_pages_shown' not in st.session_state:
+    st.session_state.fetch_pages_shown = 0  # 화면에 반영한 도착 페이지 수
+if 'fetch_notice' not in st.session_state:
+    st.session_state.fetch_notice = None  # 마지막 조회 결과 안내 (종류, 문구)
+if 'fetch_notice_debug' not in st.session_state:
+    st.session_state.fetch_notice_debug = None
 if 'items_per_page_option' not in st.session_state:
     st.session_state.items_per_page_option = 50
 if 'search_button_clicked' not in st.session_state:
@@ -166,176 +126,382 @@ with st.sidebar:
     with col2:
         end_date = st.date_input("종료 날짜", value=default_end_date)
 
-    contract_name = st.text_input("용역명 (필수)", placeholder="예: 통합관제센터")
-
-    # 소관기관: 빈값(전체) 허용, 선택 후 ❌로 초기화
+    batch_mode = st.toggle("일괄 검색 (여러 용역명 × 소관기관)", key="batch_mode")
     inst_options = list(INSTITUTION_TYPES.keys())
-    select_options = [""] + inst_options
-    current = st.session_state.get('selected_institution', "")
-    default_index = select_options.index(current) if current in select_options else 0
-
-    ia, ib = st.columns([4, 1], gap="small")
-    with ia:
-        st.selectbox(
-            "소관기관 (빈칸 = 전체조회)",
-            options=select_options,
-            index=default_index,
-            key="selected_institution",
-            format_func=lambda x: "선택안함" if x == "" else x,
-            help="기관을 선택하면 필터가 적용됩니다. 빈칸이면 전체 조회됩니다."
-        )
-    # 콜백 함수 정의 (사이드바 블록 바깥이나 안쪽 어디든 가능)
-    def _clear_selected_institution():
-        # 안전하게 세션 상태 초기화
-        st.session_state['selected_institution'] = ""
 
-    # 버튼에 on_click으로 콜백 연결 (이 방식이 안전함)
-    with ib:
-        st.button("❌", key="clear_inst", on_click=_clear_selected_institution)
+    if batch_mode:
+        contract_name = st.text_area(
+            "용역명 목록 (한 줄에 하나, 필수)",
+            placeholder="예:\n통합관제센터\nCCTV\n스마트시티",
+            key="batch_contract_names",
+        )
+        st.multiselect(
+            "소관기관 (비우면 전체조회)",
+            options=inst_options,
+            key="batch_institutions",
+        )
+    else:
+        contract_name = st.text_input("용역명 (필수)", placeholder="예: 통합관제센터")
+
+        # 소관기관: 빈값(전체) 허용, 선택 후 ❌로 초기화
+        select_options = [""] + inst_options
+        current = st.session_state.get('selected_institution', "")
+        default_index = select_options.index(current) if current in select_options else 0
+
+        ia, ib = st.columns([4, 1], gap="small")
+        with ia:
+            st.selectbox(
+                "소관기관 (빈칸 = 전체조회)",
+                options=select_options,
+                index=default_index,
+                key="selected_institution",
+                format_func=lambda x: "선택안함" if x == "" else x,
+                help="기관을 선택하면 필터가 적용됩니다. 빈칸이면 전체 조회됩니다."
+            )
+        # 콜백 함수 정의 (사이드바 블록 바깥이나 안쪽 어디든 가능)
+        def _clear_selected_institution():
+            # 안전하게 세션 상태 초기화
+            st.session_state['selected_institution'] = ""
+
+        # 버튼에 on_click으로 콜백 연결 (이 방식이 안전함)
+        with ib:
+            st.button("❌", key="clear_inst", on_click=_clear_selected_institution)
+
+    # 로컬 보관소(naracli.py --store로 쌓은 연/월 Parquet)가 있으면 API 대신 바로 조회
+    use_store = st.toggle(
+        "로컬 보관소에서 조회",
+        key="use_store",
+        disabled=not os.path.isdir(DATASET_DIR),
+        help="API를 호출하지 않고 로컬에 저장된 계약에서 기간/용역명(포함)/소관기관 조건으로 찾습니다.",
+    )
 
     # 검색 버튼
     if st.button("🚀 검색 시작!"):
         st.session_state.search_button_clicked = True
-        st.session_state.current_page = 1
         st.session_state.filter_keyword = ""
         st.session_state.filter_column = display_column_names[0] if display_column_names else ""
         st.rerun()
 
-# --- API 호출 함수: 페이지네이션 포함 ---
-@st.cache_data(ttl=3600)
-def get_contract_data(start_dt, end_dt, contract_nm, instt_type_value):
-    all_data = []
-    page_no = 1
-    total_count = -1
-
-    max_retries = 3
-    retry_count = 0
-
-    while True:
-        st.info(f"데이터를 불러오는 중입니다... (페이지: {page_no})")
-        params = {
-            'serviceKey': SERVICE_KEY,
-            'pageNo': page_no,
-            'numOfRows': MAX_API_ROWS,
-            'inqryDiv': '1',
-            'type': 'xml',
-            'inqryBgnDate': start_dt.strftime("%Y%m%d"),
-            'inqryEndDate': end_dt.strftime("%Y%m%d"),
-            'cntrctNm': contract_nm
+# --- API 호출 함수: 조회 로직은 naracore, 여기서는 화면 표시와 캐시 자원만 담당 ---
+@st.cache_resource
+def get_api_client():
+    # 세션(연결 풀)은 재실행/사용자 간에 공유: 여러 사용자의 조회 작업이 동시에 요청하므로 그만큼 크게
+    return ContractApiClient(pool_size=FETCH_CONCURRENCY * SHARED_FETCH_JOBS)
+
+
+@st.cache_resource
+def get_day_cache():
+    return ContractDayCache(CACHE_DB_PATH)
+
+
+@st.cache_resource
+def get_metrics():
+    # 계측 로그: NARA_METRICS_LOG가 없으면 DEBUG 모드에서만 캐시 폴더의 metrics.jsonl에 기록
+    log_path = METRICS_LOG_PATH
+    if not log_path and DEBUG:
+        log_path = os.path.join(os.path.dirname(CACHE_DB_PATH), "metrics.jsonl")
+    return Metrics(log_path=log_path)
+
+
+@st.cache_resource
+def get_result_cache():
+    # 조회 결과는 모든 세션이 함께 사용 (같은 조건을 동시에 검색하면 한 번만 조회)
+    return ResultCache()
+
+
+def start_fetch_job(start_dt, end_dt, queries):
+    """queries(ContractQuery 튜플) 조회를 백그라운드 작업으로 시작.
+
+    결과는 ingest_contracts까지 적용된 프레임으로, 같은 조건의 조회와 함께 세션 간에 공유되므로
+    수정하지 않는다.
+    """
+    client = get_api_client()
+
+    # 디버그: 검색 조건 확인 (주의: serviceKey 값 자체는 출력하지 않음)
+    if DEBUG:
+        st.sidebar.write("DEBUG queries:", [tuple(q) for q in queries])
+        st.sidebar.write("DEBUG serviceKey_present:", bool(client.service_key))
+
+    return FetchJob(
+        start_dt, end_dt, queries, client=client, cache=get_day_cache(),
+        result_cache=get_result_cache(), metrics=get_metrics(),
+    ).start()
+
+
+@st.cache_resource
+def get_frame_spiller():
+    # 모든 세션의 조회 결과를 추적해 오래 쓰지 않은 것은 디스크로 내보냄
+    return FrameSpiller()
+
+
+def current_frame():
+    """세션의 조회 결과 DataFrame (디스크로 내보냈으면 다시 읽음, 없으면 빈 DataFrame)"""
+    dataset = st.session_state.dataset
+    return dataset.frame if dataset is not None else pd.DataFrame()
+
+
+def current_rows():
+    """세션의 조회 결과 행 수 (디스크로 내보낸 상태에서도 다시 읽지 않음)"""
+    dataset = st.session_state.dataset
+    return dataset.rows if dataset is not None else 0
+
+
+def _set_dataset(df):
+    """세션의 데이터셋을 df로 교체. 적용 중인 필터 조건은 새 데이터에 다시 적용"""
+    st.session_state.dataset = get_frame_spiller().track(SpillableFrame(df))
+    st.session_state.filter_indexes = {}
+    st.session_state.filtered_rows = filter_rows(df, st.session_state.filter_conditions, st.session_state.filter_indexes)
+    st.session_state.data_version += 1
+    st.session_state.exports = {}
+
+
+def _extend_dataset(df):
+    """조회 작업의 부분 결과가 늘어났을 때 세션 데이터셋을 df로 교체.
+
+    부분 결과는 앞부분 행이 그대로 있고 뒤에 행만 붙으므로, 컬럼이 같으면 필터 색인에 새 행만 추가하고
+    데이터셋 버전(그리드 옵션)은 유지한다. 만든 내보내기 파일은 행이 늘었으므로 버린다.
+    """
+    dataset = st.session_state.dataset
+    if dataset is None or dataset.rows == 0 or dataset.rows > len(df) or dataset.columns != list(df.columns):
+        _set_dataset(df)
+        return
+    old_rows = dataset.rows
+    st.session_state.dataset = get_frame_spiller().track(SpillableFrame(df))
+    for col, index in st.session_state.filter_indexes.items():
+        index.extend(df[col].iloc[old_rows:])
+    st.session_state.filtered_rows = filter_rows(df, st.session_state.filter_conditions, st.session_state.filter_indexes)
+    st.session_state.exports = {}
+
+
+def sync_fetch_job():
+    """진행 중인 조회 작업을 세션에 반영: 새 페이지가 왔으면 부분 결과로, 끝났으면 최종 결과로 교체"""
+    job = st.session_state.fetch_job
+    if job is None:
+        return
+
+    if job.finished:
+        st.session_state.fetch_job = None
+        if job.cancelled:
+            st.session_state.fetch_notice = ('warning', f"조회를 취소했습니다. 지금까지 받은 {current_rows()}건만 표시합니다.")
+        elif job.error is not None:
+            # 받은 페이지가 있으면 화면에 남겨 둠
+            note = f" (지금까지 받은 {current_rows()}건만 표시)" if current_rows() else ""
+            st.session_state.fetch_notice = ('error', describe_fetch_error(job.error) + note)
+        else:
+            _set_dataset(job.result)
+            st.session_state.fetch_notice = ('success', f"총 {len(job.result)}건을 불러왔습니다!")
+        client = get_api_client()
+        if DEBUG and client.last_response is not None:
+            st.session_state.fetch_notice_debug = (client.last_response.status_code, client.last_response.text[:1500])
+    elif job.pages != st.session_state.fetch_pages_shown:
+        st.session_state.fetch_pages_shown = job.pages
+        _extend_dataset(job.partial_frame())
+
+
+@st.fragment(run_every=1)
+def fetch_job_panel():
+    """조회 진행률과 취소 버튼. 이 부분만 1초마다 다시 실행하고, 새 페이지가 왔거나 작업이 끝났을 때만 전체 화면을 다시 실행"""
+    # 전체 실행에서 부른 경우 표시: 방금 sync_fetch_job으로 반영했으므로 여기서 재실행하지 않음
+    full_run = st.session_state.pop('fetch_panel_full_run', False)
+    job = st.session_state.fetch_job
+    if job is None:
+        return
+
+    pages_done, pages_total, rows_done, rows_total = job.progress
+    p0, p1 = st.columns([8.5, 1.5], gap="small")
+    with p0:
+        if job.waiting:
+            st.info("같은 조건의 조회가 이미 진행 중입니다. 결과를 기다리는 중...")
+        else:
+            # 진행률은 구간별 totalCount 합 대비 받은 행 수 기준 (구간을 확인할수록 분모가 늘어날 수 있음)
+            retry_note = f", 재시도 {job.retries}회" if job.retries else ""
+            st.progress(
+                rows_done / rows_total if rows_total else 0.0,
+                text=f"데이터를 불러오는 중입니다... {rows_done:,}/{rows_total:,}건 ({pages_done}/{pages_total} 페이지{retry_note})",
+            )
+    with p1:
+        if st.button("⏹ 조회 취소", key="cancel_fetch_button", use_container_width=True):
+            job.cancel()
+
+    # 버튼을 먼저 그린 뒤 확인 (취소 클릭이 재실행으로 사라지지 않도록). 전체 실행 중에 재실행하면
+    # 그 아래 위젯(필터 적용 등)의 클릭이 사라지므로, 작업이 그사이 끝났으면 다음 주기에 반영
+    if not full_run and (job.finished or job.pages != st.session_state.fetch_pages_shown):
+        st.rerun()
+
+
+# --- 결과 표 표시/요약 준비 (조회 결과마다 한 번) ---
+@st.cache_resource
+def get_derived_frames():
+    # {id(조회 결과): (약한 참조, {이름: (파생 데이터, 크기)})}: 같은 결과를 보는 세션끼리 공유하고, 원본이 사라지면 함께 삭제
+    return {}
+
+
+@st.cache_resource
+def get_derived_lock():
+    # get_derived_frames()의 dict는 여러 세션(스크립트 스레드)이 함께 고치므로 읽고 고칠 때 이 잠금을 잡음
+    return threading.RLock()
+
+
+def _nbytes(value):
+    """파생 데이터의 대략적인 크기 (DataFrame, bytes와 그 dict/tuple/list)"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _derived(df, name, build):
+    """df에서 만든 파생 데이터(name)를 처음 한 번만 build()로 만들고 이후 재사용 (build는 잠금 밖에서 실행)"""
+    frames, lock = get_derived_frames(), get_derived_lock()
+    key = id(df)
+
+    def _forget(_):
+        with lock:
+            frames.pop(key, None)
+
+    with lock:
+        cached = frames.get(key)
+        if cached is None or cached[0]() is not df:
+            cached = frames[key] = (weakref.ref(df, _forget), {})
+        entry = cached[1].get(name)
+    if entry is None:
+        value = build()
+        with lock:
+            entry = cached[1].setdefault(name, (value, _nbytes(value)))
+    return entry[0]
+
+
+def _derived_entries(df):
+    """df의 파생 데이터 {이름: (값, 크기)} (없으면 빈 dict). 읽거나 고칠 때는 get_derived_lock()을 잡을 것"""
+    cached = get_derived_frames().get(id(df))
+    return cached[1] if cached is not None and cached[0]() is df else {}
+
+
+def _get_display_frame(df):
+    """df의 화면 표시용 프레임 (build_display_frame 결과를 조회 결과마다 한 번 만들어 재사용)"""
+    return _derived(df, 'display', lambda: build_display_frame(df))
+
+
+SUMMARY_CACHE_KEEP = 4  # 조회 결과마다 보관하는 필터 조건별 요약 수 (오래 쓰지 않은 것부터 버림)
+
+
+def _get_summary(df, rows):
+    """df(rows: 지금 필터 결과)의 요약 표. 업체/수요기관 목록은 데이터셋마다 한 번만 펼치고,
+    요약은 필터 조건마다 한 번 만들어 최근 SUMMARY_CACHE_KEEP개까지 보관한다."""
+    tables = _derived(df, 'lookup_tables', lambda: contract_lookup_tables(df))
+    name = ('summary', tuple(sorted(st.session_state.filter_conditions.items())))
+    with get_derived_lock():
+        derived = _derived_entries(df)
+        if name in derived:
+            derived[name] = derived.pop(name)  # 최근에 쓴 순서로
+
+    def _build():
+        with get_metrics().timer('summary', rows=len(df) if rows is None else len(rows)):
+            return summarize_contracts(df, rows=rows, tables=tables)
+
+    summaries = _derived(df, name, _build)
+    with get_derived_lock():
+        derived = _derived_entries(df)
+        for old in [n for n in list(derived) if isinstance(n, tuple) and n[0] == 'summary'][:-SUMMARY_CACHE_KEEP]:
+            derived.pop(old, None)
+    return summaries
+
+
+def _get_grid_options(display_df, page_size):
+    """AgGrid 옵션 (데이터셋·페이지 크기별로 한 번 생성)"""
+    key = (st.session_state.data_version, page_size)
+    if key not in st.session_state.grid_options:
+        gb = GridOptionsBuilder.from_dataframe(display_df)
+        # 순번은 필터/정렬 후 화면에 보이는 순서대로 다시 매김
+        gb.configure_column('순번', valueGetter=JsCode("function(params) { return params.node.rowIndex + 1; }"))
+        format_js = JsCode("""
+        function(params) {
+          return params.value != null ? Number(params.value).toLocaleString('ko-KR') : '';
         }
-        # 디버그: params 확인 (주의: serviceKey 값 자체는 출력하지 않음)
-       
-        if DEBUG:
-            st.sidebar.write("DEBUG params keys:", list(params.keys()))
-            st.sidebar.write("DEBUG insttClsfcCd:", params.get('insttClsfcCd'))
-            st.sidebar.write("DEBUG serviceKey_present:", bool(params.get('serviceKey')))
-        
-        response = requests.get(API_URL, params=params, timeout=30)
-        
-        if DEBUG:
-            st.sidebar.write("DEBUG status_code:", response.status_code)
-            st.sidebar.text(response.text[:1500])
-
-        # API가 요구하는 소관기관 파라미터명으로 전송
-        if instt_type_value:
-            params['insttClsfcCd'] = str(instt_type_value)
-
-        # (디버그용) 요청 파라미터 확인 - 필요시 주석 해제
-        # st.sidebar.write("DEBUG API params:", params)
-
-        try:
-            response = requests.get(API_URL, params=params, timeout=30)
-            response.raise_for_status()
-            root = ET.fromstring(response.content)
-
-            header = root.find('header')
-            if header is not None:
-                result_code = header.find('resultCode').text if header.find('resultCode') is not None else ''
-                result_msg = header.find('resultMsg').text if header.find('resultMsg') is not None else ''
-                if result_code != '00':
-                    st.error(f"API 오류: {result_msg} ({result_code})")
-                    return pd.DataFrame()
-
-            body = root.find('body')
-            if body is None:
-                return pd.DataFrame()
-
-            current_total_count = int(body.find('totalCount').text) if body.find('totalCount') is not None else 0
-            if total_count == -1:
-                total_count = current_total_count
-
-            items = body.find('items')
-            if items is not None:
-                for item in items.findall('item'):
-                    row = {}
-                    for child in item:
-                        row[child.tag] = child.text
-                    all_data.append(row)
-
-            # 종료 조건: 전체 개수에 도달했거나 현재 페이지 아이템 수가 MAX보다 적으면 끝
-            if total_count > 0 and len(all_data) >= total_count:
-                break
-            if items is not None and len(items.findall('item')) < MAX_API_ROWS:
-                break
-
-            page_no += 1
-            retry_count = 0
-
-        except requests.exceptions.Timeout:
-            retry_count += 1
-            if retry_count <= max_retries:
-                st.warning(f"타임아웃 발생! ({retry_count}/{max_retries} 재시도 중...)")
-                time.sleep(2)
-                continue
-            else:
-                st.error("타임아웃 - 나중에 다시 시도해주세요.")
-                return pd.DataFrame()
-        except requests.exceptions.RequestException as e:
-            st.error(f"네트워크/API 오류: {e}")
-            return pd.DataFrame()
-        except ET.ParseError:
-            st.error("XML 파싱 오류 - 응답 확인 필요")
-            return pd.DataFrame()
-        except Exception as e:
-            st.error(f"알 수 없는 오류: {e}")
-            return pd.DataFrame()
-
-    st.success(f"총 {len(all_data)}건을 불러왔습니다!")
-    return pd.DataFrame(all_data)
+        """)
+        gb.configure_column('총계약금액', valueFormatter=format_js, cellStyle={'textAlign': 'right'})
+        gb.configure_column('금차계약금액', valueFormatter=format_js, cellStyle={'textAlign': 'right'})
+        gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=page_size)
+        st.session_state.grid_options = {key: gb.build()}
+    return st.session_state.grid_options[key]
+
 
 # --- 검색 실행 처리 ---
 if st.session_state.search_button_clicked:
-    inst_to_api = None
-    selected_name = st.session_state.get('selected_institution', "")
-    if selected_name:
-        inst_to_api = INSTITUTION_TYPES.get(selected_name)
+    if batch_mode:
+        # 일괄 검색: 중복/빈 줄을 뺀 용역명 × 선택한 소관기관(없으면 전체)
+        names = list(dict.fromkeys(line.strip() for line in contract_name.splitlines() if line.strip()))
+        inst_codes = [INSTITUTION_TYPES[nm] for nm in st.session_state.get('batch_institutions', [])] or ['']
+    else:
+        names = [contract_name.strip()] if contract_name and contract_name.strip() else []
+        selected_name = st.session_state.get('selected_institution', "")
+        inst_codes = [INSTITUTION_TYPES.get(selected_name, '') if selected_name else '']
+    queries = tuple(ContractQuery(nm, cd) for nm in names for cd in inst_codes)
 
     # 유효성 검사
-    if not contract_name or contract_name.strip() == "":
+    if not queries:
         st.warning("용역명을 입력하세요 (필수).")
-        st.session_state.data_df = pd.DataFrame()
-        st.session_state.filtered_data_df = pd.DataFrame()
+        st.session_state.dataset = None
+        st.session_state.filtered_rows = None
     elif start_date > end_date:
         st.warning("시작일은 종료일보다 클 수 없습니다.")
-        st.session_state.data_df = pd.DataFrame()
-        st.session_state.filtered_data_df = pd.DataFrame()
+        st.session_state.dataset = None
+        st.session_state.filtered_rows = None
     else:
-        st.cache_data.clear()
-        with st.spinner("데이터 조회 중..."):
-            df_fetched = get_contract_data(start_date, end_date, contract_name.strip(), inst_to_api)
-            st.session_state.data_df = df_fetched.copy()
-            st.session_state.filtered_data_df = df_fetched.copy()
-            st.session_state.current_page = 1
-
+        if st.session_state.fetch_job is not None:
+            st.session_state.fetch_job.cancel()  # 진행 중이던 이전 조회는 취소
+            st.session_state.fetch_job = None
+        st.session_state.filter_conditions = {}
+        st.session_state.fetch_notice = None
+        st.session_state.fetch_notice_debug = None
+        if use_store:
+            # 보관소 조회: 기간/용역명/소관기관 조건은 Parquet 읽기 단계에서 적용
+            jurisdictions = None if '' in inst_codes else [nm for nm, cd in INSTITUTION_TYPES.items() if cd in inst_codes]
+            with st.spinner("로컬 보관소 조회 중..."):
+                try:
+                    df_store = ContractDataset(DATASET_DIR).query(
+                        start=start_date, end=end_date, keywords=names, jurisdictions=jurisdictions,
+                    )
+                except ImportError:
+                    st.session_state.fetch_notice = ('error', "로컬 보관소 조회에는 pyarrow 패키지가 필요합니다.")
+                    df_store = pd.DataFrame()
+            _set_dataset(ingest_contracts(df_store))
+            if st.session_state.fetch_notice is None:
+                st.session_state.fetch_notice = ('success', f"로컬 보관소에서 {len(df_store)}건을 찾았습니다.")
+        else:
+            # 조회는 백그라운드에서 진행하고 도착한 페이지부터 표시
+            _set_dataset(pd.DataFrame())
+            st.session_state.fetch_job = start_fetch_job(start_date, end_date, queries)
+            st.session_state.fetch_pages_shown = 0
+    
     st.session_state.search_button_clicked = False
     st.rerun()
 
-# --- 메인 화면: 필터, 페이지당 표시, 다운로드, 테이블, 페이지네이션 (display only) ---
-if not st.session_state.data_df.empty:
+# --- 조회 진행 상황 / 결과 안내 ---
+sync_fetch_job()
+st.session_state.fetch_panel_full_run = True
+fetch_job_panel()
+if st.session_state.fetch_notice is not None:
+    kind, message = st.session_state.fetch_notice
+    getattr(st, kind)(message)
+if DEBUG and st.session_state.fetch_notice_debug is not None:
+    st.sidebar.write("DEBUG status_code:", st.session_state.fetch_notice_debug[0])
+    st.sidebar.text(st.session_state.fetch_notice_debug[1])
+
+# --- 메인 화면: 필터, 페이지당 표시, 다운로드, 테이블 (display only) ---
+if current_rows():
+    data_df = current_frame()
     # 상단 컨트롤 (필터 + 페이지당 표시)
     left_col, right_col = st.columns([7, 3], gap="small")
     with left_col:
-        st.subheader(f"📊 조회 결과 (총 {len(st.session_state.filtered_data_df)}건)")
+        filtered_rows = st.session_state.filtered_rows
+        total_rows = len(data_df) if filtered_rows is None else len(filtered_rows)
+        st.subheader(f"📊 조회 결과 (총 {total_rows}건)")
         f0, f1, f2, f3 = st.columns([1.5, 3, 1.2, 1], gap="small")
         with f0:
             # 안전한 selectbox 초기화
@@ -348,132 +514,163 @@ if not st.session_state.data_df.empty:
             st.session_state.filter_keyword = st.text_input("", value=st.session_state.filter_keyword, placeholder=f"'{st.session_state.filter_column}'에서 검색할 키워드를 입력하세요", key="filter_keyword_input", label_visibility="collapsed")
         with f2:
             if st.button("필터 적용", key="apply_filter_button"):
-                temp_df = st.session_state.data_df.copy()
+                # 선택한 컬럼의 조건만 바꾸고 다른 컬럼 조건은 유지 (빈 키워드는 해당 조건 해제)
                 api_col = reverse_display_columns_map.get(st.session_state.filter_column)
-                if st.session_state.filter_keyword and api_col in temp_df.columns:
-                    kw = st.session_state.filter_keyword.lower()
-                    temp_df = temp_df[temp_df[api_col].astype(str).str.lower().str.contains(kw, na=False)]
-                st.session_state.filtered_data_df = temp_df
-                st.session_state.current_page = 1
+                conditions = dict(st.session_state.filter_conditions)
+                conditions.pop(api_col, None)
+                if st.session_state.filter_keyword:
+                    conditions[api_col] = st.session_state.filter_keyword
+                st.session_state.filter_conditions = conditions
+                with get_metrics().timer('filter', conditions=len(conditions)) as fields:
+                    st.session_state.filtered_rows = filter_rows(data_df, conditions, st.session_state.filter_indexes)
+                    fields['rows'] = len(data_df) if st.session_state.filtered_rows is None else len(st.session_state.filtered_rows)
                 st.rerun()
         with f3:
             sel = st.selectbox("", options=[10,30,50,100], index=[10,30,50,100].index(st.session_state.items_per_page_option), key="items_per_page_selector", label_visibility="collapsed")
             if sel != st.session_state.items_per_page_option:
                 st.session_state.items_per_page_option = sel
-                st.session_state.current_page = 1
                 st.rerun()
 
+        if st.session_state.filter_conditions:
+            c0, c1 = st.columns([8.5, 1.5], gap="small")
+            with c0:
+                st.caption("적용된 조건: " + " AND ".join(
+                    f"{display_columns_map.get(col, col)} ⊃ '{kw}'" for col, kw in st.session_state.filter_conditions.items()
+                ))
+            with c1:
+                if st.button("조건 초기화", key="clear_filter_button"):
+                    st.session_state.filter_conditions = {}
+                    st.session_state.filtered_rows = None
+                    st.rerun()
+
     with right_col:
         st.markdown("<br>", unsafe_allow_html=True)
         dlc1, dlc2 = st.columns([1,1], gap="small")
         with dlc1:
-            df_csv = st.session_state.data_df.copy()
-            df_csv.rename(columns=DOWNLOAD_COLUMN_MAP, inplace=True)
-            for col_original in DOWNLOAD_AMOUNT_ORIGINAL_COLS:
-                col_k = DOWNLOAD_COLUMN_MAP.get(col_original)
-                if col_k and col_k in df_csv.columns:
-                    df_csv[col_k] = pd.to_numeric(df_csv[col_k].astype(str).str.replace(',', ''), errors='coerce')
-            csv_bytes = df_csv.to_csv(index=False, encoding='utf-8-sig')
-            st.download_button("⬇️ CSV 다운", data=csv_bytes, file_name=f"계약내역_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", mime="text/csv", key="dl_csv", use_container_width=True)
+            export_fmt = st.selectbox("", options=list(EXPORT_FORMATS), key="export_format_selector", label_visibility="collapsed")
         with dlc2:
-            df_xlsx = st.session_state.data_df.copy()
-            df_xlsx.rename(columns=DOWNLOAD_COLUMN_MAP, inplace=True)
-            for col_original in DOWNLOAD_AMOUNT_ORIGINAL_COLS:
-                col_k = DOWNLOAD_COLUMN_MAP.get(col_original)
-                if col_k and col_k in df_xlsx.columns:
-                    df_xlsx[col_k] = pd.to_numeric(df_xlsx[col_k].astype(str).str.replace(',', ''), errors='coerce')
-            buf = io.BytesIO()
-            df_xlsx.to_excel(buf, index=False, engine='openpyxl')
-            buf.seek(0)
-            st.download_button("⬇️ XLSX 다운", data=buf, file_name=f"계약내역_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key="dl_xlsx", use_container_width=True)
-
-    # 테이블 표시 준비
-    total_rows = len(st.session_state.filtered_data_df)
-    items_per_page = st.session_state.items_per_page_option
-    total_pages = (total_rows + items_per_page - 1) // items_per_page if total_rows > 0 else 1
-
-    if st.session_state.current_page > total_pages:
-        st.session_state.current_page = total_pages
-        st.rerun()
-
-    start_index = (st.session_state.current_page - 1) * items_per_page
-    end_index = min(start_index + items_per_page, total_rows)
-    df_page = st.session_state.filtered_data_df.iloc[start_index:end_index].copy()
-    # # 순번 추가하는 부분(기존 유지)
-    # 기존 순번 추가, 컬럼 순서 지정 등은 동일
-    if not df_page.empty:
-        if '순번' not in df_page.columns:
-            df_page.insert(0, '순번', range(start_index + 1, start_index + 1 + len(df_page)))
-    
-    cols_to_display = ['순번'] + [c for c in display_columns_map.keys() if c in df_page.columns and c != '순번']
-    
-    df_display = df_page[cols_to_display].copy()
-    df_display.rename(columns={**display_columns_map, '순번': '순번'}, inplace=True)
-    
-    # 기본 인덱스 제거
-    df_display = df_display.reset_index(drop=True).copy()
-    
-    for col in DOWNLOAD_AMOUNT_ORIGINAL_COLS:
-        if col in df_display.columns:
-            df_display[col] = pd.to_numeric(
-                df_display[col].astype(str).str.replace(',', '').str.strip(),
-                errors='coerce'   # 변환 불가하면 NaN
-            )
-    st.sidebar.write({c: str(df_display[c].dtype) for c in DOWNLOAD_AMOUNT_ORIGINAL_COLS if c in df_display.columns})
-    # st.sidebar.write(df_display[DOWNLOAD_AMOUNT_ORIGINAL_COLS].head().to_dict())
-    
-    # AgGrid 옵션 설정
-    items_per_page = st.session_state.get('items_per_page_option', 50)
-    ROW_PX = 30
-    table_height = ROW_PX * int(items_per_page) + 60
-    
-    gb = GridOptionsBuilder.from_dataframe(df_display)
-    # 컬럼 옵션 등 설정
-    format_js = JsCode("""
-    function(params) {
-      return params.value != null ? Number(params.value).toLocaleString('ko-KR') : '';
-    }
-    """)
-    gb.configure_column('총계약금액', valueFormatter=format_js, cellStyle={'textAlign': 'right'})
-    gb.configure_column('금차계약금액', valueFormatter=format_js, cellStyle={'textAlign': 'right'})
-    
-    
-    gridOptions = gb.build()
-    AgGrid(df_display, gridOptions=gridOptions, fit_columns_on_grid_load=True, height=600, allow_unsafe_jscode=True)
-
-
-    # 페이지네이션 UI (가운데 정렬)
-    st.markdown("<br>", unsafe_allow_html=True)
-    current_block = (st.session_state.current_page - 1) // 10
-    start_page = current_block * 10 + 1
-    end_page = min(start_page + 9, total_pages)
-
-    page_buttons = []
-    if start_page > 1:
-        page_buttons.append(("«", start_page - 1))
-    if st.session_state.current_page > 1:
-        page_buttons.append(("⬅", st.session_state.current_page - 1))
-    for i in range(start_page, end_page + 1):
-        page_buttons.append((str(i), i))
-    if st.session_state.current_page < total_pages:
-        page_buttons.append(("➡", st.session_state.current_page + 1))
-    if end_page < total_pages:
-        page_buttons.append(("»", end_page + 1))
-
-    btn_w = 0.06
-    total_w = len(page_buttons) * btn_w
-    pad = (1.0 - total_w) / 2 if total_w < 1.0 else 0.0
-    cols = st.columns([pad] + [btn_w] * len(page_buttons) + [pad])
-    for idx, (txt, pg) in enumerate(page_buttons):
-        with cols[idx + 1]:
-            if txt.isdigit() and st.session_state.current_page == pg:
-                if st.button(f"**{txt}**", key=f"pg_{pg}", use_container_width=True):
-                    st.session_state.current_page = pg
+            # 파일은 요청했을 때만 만들고, 같은 데이터셋에서는 만든 결과를 재사용
+            export_key = (st.session_state.data_version, export_fmt)
+            if export_key not in st.session_state.exports:
+                if st.button("📦 파일 생성", key="build_export_button", use_container_width=True):
+                    with st.spinner(f"{export_fmt} 파일 생성 중..."):
+                        try:
+                            with get_metrics().timer('export', fmt=export_fmt, rows=len(data_df)) as fields:
+                                data = build_export(data_df, export_fmt)
+                                fields['bytes'] = len(data)
+                        except ImportError:
+                            st.error("Parquet 내보내기에는 pyarrow 패키지가 필요합니다.")
+                        else:
+                            ext, _ = EXPORT_FORMATS[export_fmt]
+                            st.session_state.exports[export_key] = (data, f"계약내역_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}")
                     st.rerun()
             else:
-                if st.button(txt, key=f"pg_{txt}_{pg}", use_container_width=True):
-                    st.session_state.current_page = pg
-                    st.rerun()
-
-else:
+                data, file_name = st.session_state.exports[export_key]
+                st.download_button(f"⬇️ {export_fmt} 다운", data=data, file_name=file_name, mime=EXPORT_FORMATS[export_fmt][1], key="dl_export", use_container_width=True)
+
+    # 선택한 탭만 실행 (목록 그리드와 요약은 각 탭을 열었을 때만 만듦)
+    list_tab, summary_tab = st.tabs(["📋 목록", "📈 요약"], key="result_view_tabs", on_change="rerun")
+    if list_tab.open:
+        with list_tab:
+            # 테이블 표시: 데이터셋마다 한 번 만든 표시용 프레임과 그리드 옵션을 재사용하고,
+            # 페이지 이동은 AgGrid 자체 페이지네이션(브라우저)으로 처리해 스크립트를 다시 실행하지 않음
+            items_per_page = st.session_state.items_per_page_option
+            display_df = _get_display_frame(data_df)
+            grid_options = _get_grid_options(display_df, items_per_page)
+            df_view = display_df if filtered_rows is None else display_df.iloc[filtered_rows]
+
+            if DEBUG:
+                amount_cols = [display_columns_map[c] for c in DOWNLOAD_AMOUNT_ORIGINAL_COLS]
+                st.sidebar.write({c: str(display_df[c].dtype) for c in amount_cols if c in display_df.columns})
+
+            # render: 그리드로 넘기기까지의 서버 측 시간 (브라우저 그리기 시간은 포함하지 않음)
+            with get_metrics().timer('render', rows=len(df_view)):
+                AgGrid(df_view, gridOptions=grid_options, fit_columns_on_grid_load=True, height=600, allow_unsafe_jscode=True)
+
+    if summary_tab.open:
+        with summary_tab:
+            if st.session_state.fetch_job is not None:
+                # 부분 결과는 페이지가 올 때마다 바뀌므로 조회가 끝난 뒤 한 번만 집계
+                st.info("조회가 끝나면 요약을 계산합니다.")
+            else:
+                summaries = _get_summary(data_df, filtered_rows)
+                s0, s1 = st.columns([8.5, 1.5], gap="small")
+                with s0:
+                    st.caption("지금 필터 결과 기준 집계입니다. 업체/수요기관별 합계는 계약 금액 전액을 각각에 더하고, 지분 반영 금액은 업체 지분율만큼만 더합니다.")
+                with s1:
+                    # 요약 파일도 요청했을 때만 만들고, 같은 데이터셋·조건에서는 만든 결과를 재사용
+                    summary_key = (st.session_state.data_version, 'summary', tuple(sorted(st.session_state.filter_conditions.items())))
+                    if summary_key not in st.session_state.exports:
+                        if st.button("📦 요약 파일 생성", key="build_summary_button", use_container_width=True):
+                            with get_metrics().timer('export', fmt='summary_xlsx') as fields:
+                                data = build_summary_export(summaries)
+                                fields['bytes'] = len(data)
+                            st.session_state.exports[summary_key] = (data, f"계약요약_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+                            st.rerun()
+                    else:
+                        data, file_name = st.session_state.exports[summary_key]
+                        st.download_button("⬇️ 요약 XLSX", data=data, file_name=file_name,
+                                           mime=EXPORT_FORMATS['XLSX'][1], key="dl_summary", use_container_width=True)
+
+                month_df = summaries['month']
+                amount_label = next((c for c in month_df.columns if c.endswith(' 합계')), '건수')
+                st.markdown(f"**{SUMMARY_LABELS['month'][0]} {amount_label}**")
+                st.bar_chart(month_df.set_index(SUMMARY_LABELS['month'][1])[amount_label])
+
+                amount_format = {c: st.column_config.NumberColumn(format="localized")
+                                 for table in summaries.values() for c in table.columns if c != '건수'
+                                 and pd.api.types.is_numeric_dtype(table[c])}
+                for names in (('institution', 'category'), ('vendor', 'demand')):
+                    for col, name in zip(st.columns(2, gap="small"), names):
+                        with col:
+                            st.markdown(f"**{SUMMARY_LABELS[name][0]}** ({len(summaries[name])})")
+                            st.dataframe(summaries[name], hide_index=True, height=300,
+                                         column_config=amount_format, use_container_width=True)
+
+    if DEBUG:
+        st.sidebar.write("DEBUG metrics:", get_metrics().summary())
+        st.sidebar.write("DEBUG result_cache:", get_result_cache().stats())
+        st.sidebar.write("DEBUG session_frames:", get_frame_spiller().stats())
+
+elif st.session_state.fetch_job is None:
     st.info("용역명과 조회 기간을 설정한 뒤 '검색 시작'을 눌러주세요.")
+
+# --- 세션 메모리 정리 ---
+def _session_bytes():
+    """세션이 보관하는 조회 결과(메모리에 있을 때)와 그 표시용/요약 데이터, 내보내기 파일, 필터 색인의 대략적인 크기"""
+    dataset = st.session_state.dataset
+    frame = dataset.peek() if dataset is not None else None
+    used = dataset.nbytes if frame is not None else 0
+    if frame is not None:
+        with get_derived_lock():
+            used += sum(nbytes for _, nbytes in list(_derived_entries(frame).values()))
+    used += sum(len(data) for data, _ in st.session_state.exports.values())
+    return used + sum(index.nbytes for index in st.session_state.filter_indexes.values())
+
+
+def enforce_session_memory():
+    """세션 사용량이 SESSION_MEMORY_BUDGET을 넘으면 오래된 내보내기 파일, 지금 조건에 쓰지 않는 필터 색인,
+    표시용 프레임 외의 파생 데이터(요약 등) 순으로 버리고 (필요하면 다시 만듦), 그래도 넘으면 세션의 조회 결과를
+    디스크로 내보낸다. 끝으로 기한이 지난 공유 조회 결과와, 모든 세션 중 오래 쓰지 않은 조회 결과를 정리한다."""
+    exports = st.session_state.exports
+    while len(exports) > 1 and _session_bytes() > SESSION_MEMORY_BUDGET:  # 마지막에 만든 파일은 남김
+        exports.pop(next(iter(exports)))
+    indexes = st.session_state.filter_indexes
+    for col in [c for c in indexes if c not in st.session_state.filter_conditions]:
+        if _session_bytes() <= SESSION_MEMORY_BUDGET:
+            break
+        del indexes[col]
+    dataset = st.session_state.dataset
+    frame = dataset.peek() if dataset is not None else None
+    if frame is not None and _session_bytes() > SESSION_MEMORY_BUDGET:
+        with get_derived_lock():
+            derived = _derived_entries(frame)
+            for name in [n for n in list(derived) if n != 'display']:
+                derived.pop(name, None)
+        if _session_bytes() > SESSION_MEMORY_BUDGET and st.session_state.fetch_job is None:
+            dataset.spill()
+    get_result_cache().purge_expired()
+    get_frame_spiller().spill_idle()
+
+
+enforce_session_memory()
@@ -0,0 +1,32 @@
+# tests/test_naracli.py
+# naracli 회귀 테스트 (실제 API 호출 없음)
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import naracli
+from naracore import ContractDataset, ContractMirror, ContractQuery
+from test_naracore import StubClient, _page
+
+
+def test_sync_store_writes_mirror_rows_to_dataset(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    page = _page(
+        {'untyCntrctNo': 'R1', 'cntrctNm': '통합관제 구축', 'cntrctCnclsDate': '2024-01-10',
+         'rgstDt': '2024-01-10 10:00:00', 'chgDt': ''},
+        {'untyCntrctNo': 'R2', 'cntrctNm': '통합관제 유지', 'cntrctCnclsDate': '2024-02-03',
+         'rgstDt': '2024-02-03 10:00:00', 'chgDt': ''},
+    )
+    monkeypatch.setattr(naracli, 'SERVICE_KEY', 'test')
+    monkeypatch.setattr(naracli, 'ContractApiClient', lambda **kwargs: StubClient(page))
+    mirror_db, dataset_dir = tmp_path / 'mirror.sqlite3', tmp_path / 'dataset'
+
+    code = naracli.main(['--sync', '--store', '-k', '통합관제', '--start', '2024-01-01', '--end', '2024-02-29',
+                         '--mirror-db', str(mirror_db), '--dataset-dir', str(dataset_dir), '--concurrency', '1', '-q'])
+    assert code == 0
+    assert ContractMirror(str(mirror_db)).synced_through(ContractQuery('통합관제')) is not None
+    stored = ContractDataset(str(dataset_dir)).query(columns=['untyCntrctNo'])
+    assert sorted(stored['untyCntrctNo']) == ['R1', 'R2']
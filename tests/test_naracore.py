@@ -0,0 +1,324 @@
+# tests/test_naracore.py
+# naracore 회귀 테스트 (실제 API 호출 없음)
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from naracore import (
+    MAX_API_ROWS,
+    ContractApiClient,
+    ContractDataset,
+    ContractDayCache,
+    ContractMirror,
+    ContractQuery,
+    FetchJob,
+    KeywordIndex,
+    NaraApiError,
+    ResultCache,
+    SpillableFrame,
+    _day_keys,
+    _parse_page,
+    _run_shards,
+    describe_fetch_error,
+    fetch_contracts,
+    sync_contracts,
+)
+
+# 서비스 키가 없거나 등록되지 않았을 때 게이트웨이가 돌려주는 응답
+GATEWAY_ERROR_PAGE = (
+    "<OpenAPI_ServiceResponse><cmmMsgHeader><errMsg>SERVICE ERROR</errMsg>"
+    "<returnAuthMsg>SERVICE_KEY_IS_NOT_REGISTERED_ERROR</returnAuthMsg>"
+    "<returnReasonCode>30</returnReasonCode></cmmMsgHeader></OpenAPI_ServiceResponse>"
+).encode('utf-8')
+
+
+def _page(*items, total_count=None):
+    """정상 응답 한 페이지. items는 {필드: 값} 목록 (total_count 생략 시 len(items))"""
+    body = "".join("<item>" + "".join(f"<{k}>{v}</{k}>" for k, v in item.items()) + "</item>" for item in items)
+    return (
+        "<response><header><resultCode>00</resultCode><resultMsg>OK</resultMsg></header>"
+        f"<body><items>{body}</items><numOfRows>{len(items)}</numOfRows><pageNo>1</pageNo>"
+        f"<totalCount>{len(items) if total_count is None else total_count}</totalCount></body></response>"
+    ).encode('utf-8')
+
+
+class _Response:
+    def __init__(self, content):
+        self.content = content
+
+
+class StubClient:
+    """항상 같은 응답을 돌려주는 클라이언트"""
+
+    def __init__(self, content):
+        self.content = content
+        self.requests = 0
+
+    def get(self, params, on_retry=None):
+        self.requests += 1
+        return _Response(self.content)
+
+
+class RangeClient:
+    """naramock처럼 요청 파라미터(조회 기간, 페이지)에 맞춰 rows에서 잘라 응답하는 클라이언트.
+    rows는 계약체결일자 순 {필드: 값} 목록, delays는 {페이지 번호: 지연(초)}"""
+
+    def __init__(self, rows, delays=None):
+        self.rows = rows
+        self.delays = delays or {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get(self, params, on_retry=None):
+        with self._lock:
+            self.requests.append((params['inqryBgnDate'], params['inqryEndDate'], params['pageNo']))
+        time.sleep(self.delays.get(params['pageNo'], 0))
+        matched = [r for r in self.rows
+                   if params['inqryBgnDate'] <= r['cntrctCnclsDate'].replace('-', '') <= params['inqryEndDate']]
+        size, page_no = params['numOfRows'], params['pageNo']
+        return _Response(_page(*matched[(page_no - 1) * size:page_no * size], total_count=len(matched)))
+
+
+def test_parse_page_rejects_gateway_error_page():
+    with pytest.raises(NaraApiError, match='SERVICE_KEY_IS_NOT_REGISTERED_ERROR'):
+        _parse_page(GATEWAY_ERROR_PAGE)
+
+
+def test_parse_page_rejects_response_without_body():
+    content = b"<response><header><resultCode>00</resultCode><resultMsg>OK</resultMsg></header></response>"
+    with pytest.raises(NaraApiError):
+        _parse_page(content)
+
+
+def test_parse_page_accepts_empty_result():
+    content = (b"<response><header><resultCode>00</resultCode><resultMsg>OK</resultMsg></header>"
+               b"<body><items></items><totalCount>0</totalCount></body></response>")
+    total_count, batch = _parse_page(content)
+    assert total_count == 0 and len(batch) == 0
+
+
+def test_request_errors_do_not_leak_service_key(monkeypatch):
+    client = ContractApiClient(api_url='http://api.invalid/', service_key='SECRET/KEY', max_retries=0)
+
+    def refuse(url, params, timeout):
+        raise requests.exceptions.ConnectionError(f"Max retries exceeded with url: /?serviceKey=SECRET%2FKEY&pageNo={params['pageNo']}")
+
+    monkeypatch.setattr(client.session, 'get', refuse)
+    with pytest.raises(requests.exceptions.ConnectionError) as excinfo:
+        client.get({'pageNo': 1})
+    assert 'SECRET' not in str(excinfo.value) and 'serviceKey=***' in str(excinfo.value)
+    assert isinstance(excinfo.value.__cause__, requests.exceptions.ConnectionError)
+    assert 'SECRET' not in describe_fetch_error(excinfo.value)
+
+
+def test_error_page_is_not_cached_as_empty_days(tmp_path):
+    cache = ContractDayCache(str(tmp_path / 'cache.sqlite3'))
+    query = ContractQuery('통합관제')
+    start, end = date(2024, 1, 1), date(2024, 3, 31)
+    with pytest.raises(NaraApiError):
+        fetch_contracts(start, end, (query,), client=StubClient(GATEWAY_ERROR_PAGE), cache=cache, max_workers=1)
+    days = _day_keys(start, end)
+    assert cache.missing_days(query, days) == days
+
+
+def test_sync_does_not_advance_mark_on_error_page(tmp_path):
+    mirror = ContractMirror(str(tmp_path / 'mirror.sqlite3'))
+    query = ContractQuery('통합관제')
+    with pytest.raises(NaraApiError):
+        sync_contracts((query,), mirror, since=date(2022, 1, 1), until=date(2022, 3, 31),
+                       client=StubClient(GATEWAY_ERROR_PAGE), max_workers=1)
+    assert mirror.synced_through(query) == date(2022, 1, 1)
+
+
+def test_sync_marks_newest_change_received(tmp_path):
+    mirror = ContractMirror(str(tmp_path / 'mirror.sqlite3'))
+    query = ContractQuery('통합관제')
+    page = _page(
+        {'untyCntrctNo': 'R1', 'rgstDt': '2022-01-05 10:00:00', 'chgDt': ''},
+        {'untyCntrctNo': 'R2', 'rgstDt': '2022-01-03 10:00:00', 'chgDt': '2022-02-10 09:00:00'},
+    )
+    changed = sync_contracts((query,), mirror, since=date(2022, 1, 1), until=date(2022, 3, 31),
+                             client=StubClient(page), max_workers=1)
+    assert changed[query] == 2
+    assert mirror.synced_through(query) == date(2022, 2, 10)
+
+    # 받은 행이 없으면 기준일을 옮기지 않음
+    sync_contracts((query,), mirror, until=date(2022, 6, 30), client=StubClient(_page()), max_workers=1)
+    assert mirror.synced_through(query) == date(2022, 2, 10)
+
+
+def test_run_shards_splits_large_run_and_keeps_page_order():
+    query = ContractQuery('통합관제')
+    start = date(2024, 1, 1)
+    rows = [{'untyCntrctNo': f'R{i:05d}', 'cntrctCnclsDate': (start + timedelta(days=i // 20)).isoformat()}
+            for i in range(366 * 20)]
+    client = RangeClient(rows, delays={2: 0.2})  # 2페이지가 3페이지보다 늦게 도착
+    done, progress = {}, []
+    _run_shards(client, [(query, (start, date(2024, 12, 31)))],
+                lambda q, shard, batch: done.setdefault(shard, batch.column('untyCntrctNo')),
+                max_workers=4, on_progress=lambda *p: progress.append(p), shard_max_rows=3000)
+
+    shards = sorted(done)
+    assert len(shards) == 3  # 7320건 / 3000건 -> 세 구간
+    assert shards[0][0] == start and shards[-1][1] == date(2024, 12, 31)
+    assert all(a[1] + timedelta(days=1) == b[0] for a, b in zip(shards, shards[1:]))
+    assert [key for shard in shards for key in done[shard]] == [r['untyCntrctNo'] for r in rows]
+    pages = 1 + sum(-(-len(done[shard]) // MAX_API_ROWS) for shard in shards)  # 전체 구간 확인 1페이지 + 구간별 페이지
+    assert len(client.requests) == pages
+    assert progress[-1] == (pages, pages, len(rows), len(rows))
+
+
+def test_run_shards_does_not_split_small_run():
+    query = ContractQuery('통합관제')
+    rows = [{'untyCntrctNo': f'R{i}', 'cntrctCnclsDate': f'2024-{i % 12 + 1:02d}-15'} for i in range(12)]
+    rows.sort(key=lambda r: r['cntrctCnclsDate'])
+    client = RangeClient(rows)
+    done = []
+    _run_shards(client, [(query, (date(2024, 1, 1), date(2024, 12, 31)))],
+                lambda q, shard, batch: done.append(batch.column('untyCntrctNo')), max_workers=4)
+    assert len(client.requests) == 1
+    assert done == [[r['untyCntrctNo'] for r in rows]]
+
+
+def test_result_cache_computes_once_for_concurrent_requests():
+    cache = ResultCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls, waited, results = [], [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(
+        cache.get_or_compute('key', compute, on_wait=lambda: (waited.append(1), release.set()))))
+    follower.start()
+    leader.join(5)
+    follower.join(5)
+    assert calls == [1] and waited == [1]
+    assert results == ['value', 'value']
+    assert (cache.misses, cache.coalesced) == (1, 1)
+
+
+def test_result_cache_shares_errors_without_caching_them():
+    cache = ResultCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise NaraApiError("API 오류")
+
+    def request(on_wait=None):
+        try:
+            cache.get_or_compute('key', fail, on_wait=on_wait)
+        except NaraApiError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=request)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=request, kwargs={'on_wait': release.set})
+    follower.start()
+    leader.join(5)
+    follower.join(5)
+    assert len(errors) == 2 and errors[0] is errors[1]  # 기다린 쪽도 같은 예외를 받음
+    assert cache.get_or_compute('key', lambda: 'retried') == 'retried'  # 오류는 캐시하지 않음
+
+
+def test_result_cache_evicts_least_recently_used_over_max_bytes():
+    cache = ResultCache(max_bytes=100, ttl=60, sizeof=len)
+    cache.get_or_compute('a', lambda: 'x' * 40)
+    cache.get_or_compute('b', lambda: 'x' * 40)
+    cache.get_or_compute('a', lambda: 'unused')  # a를 최근에 쓴 것으로
+    cache.get_or_compute('c', lambda: 'x' * 40)  # 120 > 100: 가장 오래 쓰지 않은 b를 버림
+    assert cache.total_bytes == 80
+    assert cache.get_or_compute('a', lambda: 'recomputed') == 'x' * 40
+    assert cache.get_or_compute('b', lambda: 'recomputed') == 'recomputed'
+    cache.get_or_compute('big', lambda: 'x' * 200)  # 상한보다 큰 결과는 보관하지 않음
+    assert cache.get_or_compute('big', lambda: 'again') == 'again'
+
+
+def test_spilled_frame_reattaches_to_shared_frame(tmp_path):
+    pytest.importorskip('pyarrow')
+    cache = ResultCache(ttl=60)
+    shared = cache.get_or_compute('key', lambda: pd.DataFrame({'a': range(10)}))
+    spillable = SpillableFrame(shared, spill_dir=str(tmp_path))
+    assert spillable.spill() == 0  # ResultCache가 잡고 있어 놓은 메모리 없음
+    assert spillable.frame is shared
+    del shared
+
+    assert cache.purge_expired(now=float('inf')) > 0
+    spillable.spill()
+    assert spillable.frame['a'].tolist() == list(range(10))  # 공유 프레임이 사라지면 파일에서 읽음
+
+
+def test_keyword_index_extend_matches_full_index():
+    values = pd.Series(['통합관제 구축', 'CCTV 유지관리', None, '통합관제 유지', 'cctv 설치', '관제'], dtype=object)
+    extended = KeywordIndex(values.iloc[:3])
+    extended.extend(values.iloc[3:])
+    full = KeywordIndex(values)
+    for keyword in ('관제', 'cctv', '유지', '설치', '없음', '통'):
+        assert extended.search(keyword).tolist() == full.search(keyword).tolist()
+
+
+def test_fetch_reports_cached_days_before_requests(tmp_path):
+    cache = ContractDayCache(str(tmp_path / 'cache.sqlite3'))
+    query = ContractQuery('통합관제')
+    page = _page({'untyCntrctNo': 'R1', 'cntrctCnclsDate': '2024-01-10'})
+    fetch_contracts(date(2024, 1, 1), date(2024, 1, 31), (query,), client=StubClient(page), cache=cache, max_workers=1)
+
+    client = StubClient(_page({'untyCntrctNo': 'R2', 'cntrctCnclsDate': '2024-02-10'}))
+    cached = []
+    df = fetch_contracts(date(2024, 1, 1), date(2024, 2, 29), (query,), client=client, cache=cache, max_workers=1,
+                         on_cached=lambda q, batch: cached.append((client.requests, batch.column('untyCntrctNo'))))
+    assert cached == [(0, ['R1'])]
+    assert client.requests == 1  # 2월 구간만 요청
+    assert sorted(df['untyCntrctNo']) == ['R1', 'R2']
+
+
+def test_partial_frame_appends_new_rows_only():
+    query = ContractQuery('통합관제')
+    job = FetchJob(date(2024, 1, 1), date(2024, 1, 31), (query,))
+    job._on_cached(query, _parse_page(_page({'untyCntrctNo': 'R1'}, {'untyCntrctNo': 'R2'}))[1])
+    first = job.partial_frame()
+    job._on_page(query, None, _parse_page(_page({'untyCntrctNo': 'R2'}, {'untyCntrctNo': 'R3'}))[1])
+    second = job.partial_frame()
+    assert first['untyCntrctNo'].tolist() == ['R1', 'R2']
+    assert second['untyCntrctNo'].tolist() == ['R1', 'R2', 'R3']
+
+
+def test_dataset_ignores_stray_entries(tmp_path):
+    pytest.importorskip('pyarrow')
+    store = ContractDataset(str(tmp_path))
+    store.write(pd.DataFrame({'untyCntrctNo': ['R1'], 'cntrctCnclsDate': [pd.Timestamp('2024-01-10')]}))
+    (tmp_path / '.DS_Store').write_bytes(b'')
+    (tmp_path / 'notes').mkdir()
+    (tmp_path / 'year=2024' / '.DS_Store').write_bytes(b'')
+    assert store.query(columns=['untyCntrctNo'])['untyCntrctNo'].tolist() == ['R1']
+
+
+def test_dataset_replaces_contract_moved_to_another_month(tmp_path):
+    pytest.importorskip('pyarrow')
+    store = ContractDataset(str(tmp_path))
+    store.write(pd.DataFrame({'untyCntrctNo': ['R1', 'R2'], 'cntrctCnclsDate': [pd.Timestamp('2024-01-10'), pd.NaT]}))
+    store.write(pd.DataFrame({
+        'untyCntrctNo': ['R1', 'R2'],
+        'cntrctCnclsDate': [pd.Timestamp('2024-02-03'), pd.Timestamp('2024-03-01')],
+    }))
+    df = store.query(columns=['untyCntrctNo', 'cntrctCnclsDate'])
+    assert sorted(df['untyCntrctNo']) == ['R1', 'R2']
+    assert df.set_index('untyCntrctNo')['cntrctCnclsDate'].dt.month.to_dict() == {'R1': 2, 'R2': 3}